@@ -10,5 +10,7 @@ class ArchesLingoConfig(AppConfig):
     is_arches_application = True
 
     def ready(self):
+        import arches_lingo.signals
+
         if settings.APP_NAME.lower() == self.name:
             generate_frontend_configuration()
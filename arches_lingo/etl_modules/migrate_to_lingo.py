@@ -1,9 +1,17 @@
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack, contextmanager
 from datetime import datetime
+import io
+from itertools import groupby
 import json
 import logging
+import math
+from operator import itemgetter
 import uuid
 
-from django.db import connection
+from celery import chord
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
 from django.db.models import OuterRef, Subquery
 from django.db.models.functions import Coalesce
 from django.utils.translation import gettext as _
@@ -12,7 +20,7 @@ from arches.app.etl_modules.save import save_to_tiles
 from arches.app.etl_modules.decorators import load_data_async
 from arches.app.etl_modules.base_import_module import BaseImportModule
 from arches.app.models import models
-from arches.app.models.models import LoadStaging, NodeGroup, LoadEvent
+from arches.app.models.models import LoadEvent
 from arches.app.models.system_settings import settings
 import arches_lingo.tasks as tasks
 from arches_lingo.const import (
@@ -31,9 +39,98 @@ from arches_lingo.const import (
     CLASSIFICATION_STATUS_TIMESPAN_BEGIN_OF_BEGIN_NODEID,
     CONCEPTS_PART_OF_SCHEME_NODEGROUP_ID,
 )
+from arches_lingo.utils.concept_builder import ConceptBuilder
 
 logger = logging.getLogger(__name__)
 
+# Rough cost of migrating each concept and each of its values, used to
+# choose between running a migration in the request or in Celery.
+SECONDS_PER_CONCEPT = 0.002
+SECONDS_PER_VALUE = 0.001
+
+# Columns of load_staging written by RDMMtoLingoMigrator.copy_to_staging()
+STAGING_COLUMNS = (
+    "loadid",
+    "nodegroupid",
+    "resourceid",
+    "tileid",
+    "parenttileid",
+    "value",
+    "nodegroup_depth",
+    "source_description",
+    "passes_validation",
+    "operation",
+)
+
+# Columns of load_errors written by RDMMtoLingoMigrator.flush_node_errors()
+NODE_ERROR_COLUMNS = (
+    "type",
+    "value",
+    "source",
+    "error",
+    "message",
+    "datatype",
+    "loadid",
+    "nodeid",
+)
+
+LABEL_VALUETYPES = ("prefLabel", "altLabel", "hiddenLabel")
+NOTE_VALUETYPES = (
+    "note",
+    "changeNote",
+    "definition",
+    "description",
+    "editorialNote",
+    "example",
+    "historyNote",
+    "scopeNote",
+)
+
+# How RDM values become Lingo tiles:
+# key=valuetype val=(nodegroup alias, {node alias: value field})
+APPELLATIVE_STATUS_TILE = (
+    "appellative_status",
+    {
+        "appellative_status_ascribed_name_content": "value",
+        "appellative_status_ascribed_name_language": "language_id",
+        "appellative_status_ascribed_relation": "valuetype_id",
+    },
+)
+IDENTIFIER_TILE = (
+    "identifier",
+    {"identifier_content": "value", "identifier_type": "valuetype_id"},
+)
+SCHEME_VALUE_TILES = {
+    **dict.fromkeys(LABEL_VALUETYPES, APPELLATIVE_STATUS_TILE),
+    "identifier": IDENTIFIER_TILE,
+    **dict.fromkeys(
+        NOTE_VALUETYPES,
+        (
+            "statement",
+            {
+                "statement_content_n1": "value",
+                "statement_type_n1": "valuetype_id",
+                "statement_language_n1": "language_id",
+            },
+        ),
+    ),
+}
+CONCEPT_VALUE_TILES = {
+    **dict.fromkeys(LABEL_VALUETYPES, APPELLATIVE_STATUS_TILE),
+    "identifier": IDENTIFIER_TILE,
+    **dict.fromkeys(
+        NOTE_VALUETYPES,
+        (
+            "statement",
+            {
+                "statement_content": "value",
+                "statement_type": "valuetype_id",
+                "statement_language": "language_id",
+            },
+        ),
+    ),
+}
+
 details = {
     "etlmoduleid": "11cad3ca-e155-44b1-9910-c50b3def47f6",
     "name": "Migrate to Lingo",
@@ -51,6 +148,117 @@ details = {
 }
 
 
+class MigrationInProgress(Exception):
+    """Another run of the same load holds its lock, e.g. a task redelivered
+    by the broker while the first delivery is still running."""
+
+
+@contextmanager
+def migration_lock(cursor, loadid, scheme_conceptid=None, *, wait=False):
+    """Hold the session-level advisory lock on a load, or on staging one of
+    its schemes, so that two runs never work on it at once. Unless `wait`,
+    raise MigrationInProgress if another run holds it."""
+    key = str(loadid) + (str(scheme_conceptid) if scheme_conceptid else "")
+    if wait:
+        cursor.execute("SELECT pg_advisory_lock(hashtext(%s))", [key])
+    else:
+        cursor.execute("SELECT pg_try_advisory_lock(hashtext(%s))", [key])
+        if not cursor.fetchone()[0]:
+            raise MigrationInProgress(
+                _("Load {loadid} is already running.").format(loadid=loadid)
+            )
+    try:
+        yield
+    finally:
+        cursor.execute("SELECT pg_advisory_unlock(hashtext(%s))", [key])
+
+
+class MigrationCheckpoint:
+    """Steps of one scheme's staging already done, and how far steps run in
+    chunks got, persisted in load_event.load_details so that rerunning the
+    load skips them."""
+
+    def __init__(self, cursor, loadid, scheme_conceptid):
+        self.cursor = cursor
+        self.loadid = loadid
+        self.scheme_conceptid = str(scheme_conceptid)
+        cursor.execute(
+            """SELECT load_details -> 'checkpoints' ->> %s FROM load_event WHERE loadid = %s""",
+            (self.scheme_conceptid, loadid),
+        )
+        row = cursor.fetchone()
+        state = json.loads(row[0]) if row and row[0] else {}
+        self.done = state.get("done", [])
+        self.total = state.get("total")
+        # key=step run in chunks val=last item its finished chunks covered
+        self.positions = state.get("positions", {})
+        self.chunks = state.get("chunks", 0)
+
+    def is_done(self, step):
+        return step in self.done
+
+    def run(self, step, func, *args):
+        """Run a step unless it is done, and record it in the same
+        transaction as its work. A step returning an error response (any
+        truthy value) is rolled back and not recorded, so a rerun tries it
+        again."""
+        if self.is_done(step):
+            return None
+        with transaction.atomic():
+            if result := func(*args):
+                transaction.set_rollback(True)
+                return result
+            self.done.append(step)
+            self.save()
+        return None
+
+    def advance(self, step, position, func, *args):
+        """Run the next chunk of a step run in chunks, and record `position`,
+        the last (sorted) item it covered, in the same transaction. A rerun
+        resumes after that item, whatever chunks it then forms. A chunk
+        returning an error response is rolled back as in run()."""
+        with transaction.atomic():
+            if result := func(*args):
+                transaction.set_rollback(True)
+                return result
+            self.positions[step] = position
+            self.chunks += 1
+            self.save()
+        return None
+
+    def percent_complete(self):
+        if not self.total:
+            return 0
+        return round(100 * (len(self.done) + self.chunks) / self.total, 1)
+
+    def save(self):
+        state = {
+            "done": self.done,
+            "positions": self.positions,
+            "chunks": self.chunks,
+            "total": self.total,
+            "percent_complete": self.percent_complete(),
+        }
+        self.cursor.execute(
+            """
+            UPDATE load_event SET load_details = jsonb_set(
+                coalesce(load_details, '{}'),
+                '{checkpoints}',
+                coalesce(load_details -> 'checkpoints', '{}')
+                    || jsonb_build_object(%s::text, %s::jsonb)
+            )
+            WHERE loadid = %s
+            """,
+            (self.scheme_conceptid, json.dumps(state), self.loadid),
+        )
+        logger.info(
+            "RDM to Lingo migration %s: scheme %s %s%% staged",
+            self.loadid,
+            self.scheme_conceptid,
+            state["percent_complete"],
+        )
+
+
 class RDMMtoLingoMigrator(BaseImportModule):
     def __init__(self, request=None, loadid=None):
         self.request = request if request else None
@@ -58,7 +266,11 @@ class RDMMtoLingoMigrator(BaseImportModule):
         self.moduleid = request.POST.get("module") if request else None
         self.loadid = request.POST.get("loadid") if request else loadid
         self.datatype_factory = DataTypeFactory()
+        self.batch_size = getattr(settings, "LINGO_MIGRATION_BATCH_SIZE", 1000)
+        # key=nodeid val=(nodeid, datatype, datatype instance, config)
+        self.prepared_nodes = {}
         self.scheme_conceptid = request.POST.get("scheme") if request else None
+        self.scheme_conceptids = request.POST.getlist("scheme") if request else []
 
     def get_schemes(self, request):
         schemes = (
@@ -88,113 +300,101 @@ class RDMMtoLingoMigrator(BaseImportModule):
         return {"success": True, "data": schemes_json}
 
     def etl_schemes(self, cursor, nodegroup_lookup, node_lookup, scheme_conceptid):
-        schemes = []
-        for concept in models.Concept.objects.filter(
-            pk=scheme_conceptid
-        ).prefetch_related("value_set"):
-            scheme_to_load = {"type": "Scheme", "tile_data": []}
-            for value in concept.value_set.all():
-                scheme_to_load["resourceinstanceid"] = (
-                    concept.pk
-                )  # use old conceptid as new resourceinstanceid
-
-                if (
-                    value.valuetype_id == "prefLabel"
-                    or value.valuetype_id == "altLabel"
-                    or value.valuetype_id == "hiddenLabel"
-                ):
-                    appellative_status = {}
-                    appellative_status["appellative_status_ascribed_name_content"] = (
-                        value.value
-                    )
-                    appellative_status["appellative_status_ascribed_name_language"] = (
-                        value.language_id
-                    )
-                    appellative_status["appellative_status_ascribed_relation"] = (
-                        value.valuetype_id
-                    )
-                    scheme_to_load["tile_data"].append(
-                        {"appellative_status": appellative_status}
-                    )
-                elif value.valuetype_id == "identifier":
-                    identifier = {}
-                    identifier["identifier_content"] = value.value
-                    identifier["identifier_type"] = value.valuetype_id
-                    scheme_to_load["tile_data"].append({"identifier": identifier})
-                elif (
-                    value.valuetype_id == "note"
-                    or value.valuetype_id == "changeNote"
-                    or value.valuetype_id == "definition"
-                    or value.valuetype_id == "description"
-                    or value.valuetype_id == "editorialNote"
-                    or value.valuetype_id == "example"
-                    or value.valuetype_id == "historyNote"
-                    or value.valuetype_id == "scopeNote"
-                ):
-                    statement = {}
-                    statement["statement_content_n1"] = value.value
-                    statement["statement_type_n1"] = value.valuetype_id
-                    statement["statement_language_n1"] = value.language_id
-                    scheme_to_load["tile_data"].append({"statement": statement})
-            schemes.append(scheme_to_load)
+        values = models.Value.objects.filter(concept_id=scheme_conceptid)
+        schemes = self.transform_values(
+            self.value_rows(values), "Scheme", SCHEME_VALUE_TILES
+        )
         self.populate_staging_table(cursor, schemes, nodegroup_lookup, node_lookup)
 
-    def etl_concepts(self, cursor, nodegroup_lookup, node_lookup, concepts_to_migrate):
-        concepts = []
-        for concept in models.Concept.objects.filter(
-            nodetype="Concept", pk__in=concepts_to_migrate
-        ).prefetch_related("value_set"):
-            concept_to_load = {"type": "Concept", "tile_data": []}
-            for value in concept.value_set.all():
-                concept_to_load["resourceinstanceid"] = (
-                    concept.pk
-                )  # use old conceptid as new resourceinstanceid
-
-                if (
-                    value.valuetype_id == "prefLabel"
-                    or value.valuetype_id == "altLabel"
-                    or value.valuetype_id == "hiddenLabel"
-                ):
-                    appellative_status = {}
-                    appellative_status["appellative_status_ascribed_name_content"] = (
-                        value.value
-                    )
-                    appellative_status["appellative_status_ascribed_name_language"] = (
-                        value.language_id
-                    )
-                    appellative_status["appellative_status_ascribed_relation"] = (
-                        value.valuetype_id
-                    )
-                    concept_to_load["tile_data"].append(
-                        {"appellative_status": appellative_status}
-                    )
-                elif value.valuetype_id == "identifier":
-                    identifier = {}
-                    identifier["identifier_content"] = value.value
-                    identifier["identifier_type"] = value.valuetype_id
-                    concept_to_load["tile_data"].append({"identifier": identifier})
-                elif (
-                    value.valuetype_id == "note"
-                    or value.valuetype_id == "changeNote"
-                    or value.valuetype_id == "definition"
-                    or value.valuetype_id == "description"
-                    or value.valuetype_id == "editorialNote"
-                    or value.valuetype_id == "example"
-                    or value.valuetype_id == "historyNote"
-                    or value.valuetype_id == "scopeNote"
-                ):
-                    statement = {}
-                    statement["statement_content"] = value.value
-                    statement["statement_type"] = value.valuetype_id
-                    statement["statement_language"] = value.language_id
-                    concept_to_load["tile_data"].append({"statement": statement})
-            concepts.append(concept_to_load)
+    def etl_concepts(
+        self, cursor, nodegroup_lookup, node_lookup, concept_count, checkpoint
+    ):
+        """Extract, transform and stage the concepts collected by
+        build_concept_hierarchy() one chunk at a time, so that memory use
+        doesn't grow with the size of the scheme. Chunks run in conceptid
+        order and each records the last concept it staged, so a rerun
+        resumes after it even if the batch size or the RDM has changed."""
+        after = checkpoint.positions.get("concepts")
+        if after is not None:
+            cursor.execute(
+                """select count(*) from lingo_concept_hierarchy where concept > %s;""",
+                (after,),
+            )
+            concept_count = cursor.fetchone()[0]
+        # The scheme, each chunk of concepts, three kinds of relationship
+        checkpoint.total = (
+            1 + checkpoint.chunks + math.ceil(concept_count / self.batch_size) + 3
+        )
+        for conceptids in self.hierarchy_concept_ids(after):
+            checkpoint.advance(
+                "concepts",
+                str(conceptids[-1]),
+                self.etl_concepts_chunk,
+                cursor,
+                nodegroup_lookup,
+                node_lookup,
+                conceptids,
+            )
+
+    def etl_concepts_chunk(self, cursor, nodegroup_lookup, node_lookup, conceptids):
+        values = models.Value.objects.filter(
+            concept__nodetype="Concept", concept_id__in=conceptids
+        )
+        concepts = self.transform_values(
+            self.value_rows(values), "Concept", CONCEPT_VALUE_TILES
+        )
         self.populate_staging_table(cursor, concepts, nodegroup_lookup, node_lookup)
 
+    @staticmethod
+    def value_rows(values):
+        """(conceptid, valuetype_id, value, language_id) rows, in one query
+        ordered by concept, as transform_values() expects them."""
+        return values.order_by("concept_id").values_list(
+            "concept_id", "valuetype_id", "value", "language_id"
+        )
+
+    @staticmethod
+    def transform_values(rows, resource_type, value_tiles):
+        """Turn (conceptid, valuetype_id, value, language_id) rows, grouped
+        by concept, into resources to load, with one mock tile per value
+        mapped by `value_tiles`. Touches no database, so it can be timed
+        apart from the query feeding it."""
+        resources = []
+        for conceptid, concept_rows in groupby(rows, key=itemgetter(0)):
+            tile_data = []
+            for _conceptid, valuetype_id, value, language_id in concept_rows:
+                try:
+                    nodegroup_alias, node_fields = value_tiles[valuetype_id]
+                except KeyError:
+                    continue
+                fields = {
+                    "value": value,
+                    "valuetype_id": valuetype_id,
+                    "language_id": language_id,
+                }
+                tile_data.append(
+                    {
+                        nodegroup_alias: {
+                            node_alias: fields[field]
+                            for node_alias, field in node_fields.items()
+                        }
+                    }
+                )
+            # use old conceptid as new resourceinstanceid
+            resources.append(
+                {
+                    "type": resource_type,
+                    "resourceinstanceid": conceptid,
+                    "tile_data": tile_data,
+                }
+            )
+        return resources
+
     def populate_staging_table(
         self, cursor, concepts_to_load, nodegroup_lookup, node_lookup
     ):
         tiles_to_load = []
+        node_errors = []
         for concept_to_load in concepts_to_load:
             for mock_tile in concept_to_load["tile_data"]:
                 nodegroup_alias = next(iter(mock_tile.keys()), None)
@@ -203,31 +403,79 @@ class RDMMtoLingoMigrator(BaseImportModule):
                 tile_id = uuid.uuid4()
                 parent_tile_id = None
                 tile_value_json, passes_validation = self.create_tile_value(
-                    cursor, mock_tile, nodegroup_alias, nodegroup_lookup, node_lookup
+                    mock_tile,
+                    nodegroup_alias,
+                    nodegroup_lookup,
+                    node_lookup,
+                    node_errors,
                 )
                 operation = "insert"
+                # In the order of STAGING_COLUMNS
                 tiles_to_load.append(
-                    LoadStaging(
-                        load_event=LoadEvent(self.loadid),
-                        nodegroup=NodeGroup(nodegroup_id),
-                        resourceid=concept_to_load["resourceinstanceid"],
-                        tileid=tile_id,
-                        parenttileid=parent_tile_id,
-                        value=tile_value_json,
-                        nodegroup_depth=nodegroup_depth,
-                        source_description="{0}: {1}".format(
+                    (
+                        self.loadid,
+                        nodegroup_id,
+                        concept_to_load["resourceinstanceid"],
+                        tile_id,
+                        parent_tile_id,
+                        tile_value_json,
+                        nodegroup_depth,
+                        "{0}: {1}".format(
                             concept_to_load["type"], nodegroup_alias
                         ),  # source_description
-                        passes_validation=passes_validation,
-                        operation=operation,
+                        passes_validation,
+                        operation,
                     )
                 )
-        staged_tiles = LoadStaging.objects.bulk_create(tiles_to_load)
+        self.copy_to_staging(cursor, tiles_to_load)
+        self.flush_node_errors(cursor, node_errors)
+
+    def copy_to_staging(self, cursor, rows):
+        """Stream rows (in the order of STAGING_COLUMNS) into load_staging."""
+        self.copy_rows(cursor, "load_staging", STAGING_COLUMNS, rows)
+
+    def copy_rows(self, cursor, table, columns, rows):
+        """Stream rows into a table with COPY FROM STDIN, rather than as
+        INSERT statements."""
+        buffer = io.StringIO()
+        for row in rows:
+            buffer.write("\t".join(self.copy_text(value) for value in row))
+            buffer.write("\n")
+        buffer.seek(0)
+        cursor.copy_expert(
+            "COPY {0} ({1}) FROM STDIN".format(table, ", ".join(columns)),
+            buffer,
+        )
+
+    @staticmethod
+    def copy_text(value):
+        """Encode a value for COPY's text format."""
+        if value is None:
+            return "\\N"
+        if isinstance(value, bool):
+            value = "t" if value else "f"
+        elif isinstance(value, (dict, list)):
+            value = json.dumps(value, cls=DjangoJSONEncoder)
+        return (
+            str(value)
+            .replace("\\", "\\\\")
+            .replace("\t", "\\t")
+            .replace("\n", "\\n")
+            .replace("\r", "\\r")
+        )
 
+    def check_staged_tiles(self, cursor):
+        """Flag cardinality violations and log the tile errors of the whole
+        load, once everything is staged."""
         cursor.execute(
             """CALL __arches_check_tile_cardinality_violation_for_load(%s)""",
             [self.loadid],
         )
+        # Replace, rather than add to, the tile errors of an earlier run.
+        cursor.execute(
+            """DELETE FROM load_errors WHERE loadid = %s AND type = 'tile'""",
+            [self.loadid],
+        )
         cursor.execute(
             """
                 INSERT INTO load_errors (type, source, error, loadid, nodegroupid)
@@ -239,20 +487,18 @@ class RDMMtoLingoMigrator(BaseImportModule):
         )
 
     def create_tile_value(
-        self, cursor, mock_tile, nodegroup_alias, nodegroup_lookup, node_lookup
+        self, mock_tile, nodegroup_alias, nodegroup_lookup, node_lookup, node_errors
     ):
+        """Collects rows for load_errors in `node_errors` rather than
+        inserting them, see flush_node_errors()."""
         tile_value = {}
         tile_valid = True
         for node_alias in mock_tile[nodegroup_alias].keys():
             try:
-                nodeid = node_lookup[node_alias]["nodeid"]
-                node_details = node_lookup[node_alias]
-                datatype = node_details["datatype"]
-                datatype_instance = self.datatype_factory.get_instance(datatype)
+                nodeid, datatype, datatype_instance, config = self.prepare_node(
+                    node_lookup[node_alias]
+                )
                 source_value = mock_tile[nodegroup_alias][node_alias]
-                config = node_details["config"]
-                config["loadid"] = self.loadid
-                config["nodeid"] = nodeid
 
                 value, validation_errors = self.prepare_data_for_loading(
                     datatype_instance, source_value, config
@@ -263,8 +509,7 @@ class RDMMtoLingoMigrator(BaseImportModule):
                 error_message = ""
                 for error in validation_errors:
                     error_message = error["message"]
-                    cursor.execute(
-                        """INSERT INTO load_errors (type, value, source, error, message, datatype, loadid, nodeid) VALUES (%s,%s,%s,%s,%s,%s,%s,%s)""",
+                    node_errors.append(
                         (
                             "node",
                             source_value,
@@ -274,7 +519,7 @@ class RDMMtoLingoMigrator(BaseImportModule):
                             datatype,
                             self.loadid,
                             nodeid,
-                        ),
+                        )
                     )
 
                 tile_value[nodeid] = {
@@ -289,50 +534,99 @@ class RDMMtoLingoMigrator(BaseImportModule):
 
         return tile_value, tile_valid
 
+    def prepare_node(self, node_details):
+        """Return (nodeid, datatype, datatype instance, config) for a node,
+        resolved once per node rather than once per value."""
+        nodeid = node_details["nodeid"]
+        try:
+            return self.prepared_nodes[nodeid]
+        except KeyError:
+            pass
+        datatype = node_details["datatype"]
+        # Copied: the node lookup's config is shared by every value.
+        config = {**node_details["config"], "loadid": self.loadid, "nodeid": nodeid}
+        prepared = (
+            nodeid,
+            datatype,
+            self.datatype_factory.get_instance(datatype),
+            config,
+        )
+        self.prepared_nodes[nodeid] = prepared
+        return prepared
+
+    def flush_node_errors(self, cursor, node_errors):
+        """Write the collected rows (in the order of NODE_ERROR_COLUMNS) to
+        load_errors with a single COPY."""
+        if node_errors:
+            self.copy_rows(cursor, "load_errors", NODE_ERROR_COLUMNS, node_errors)
+            node_errors.clear()
+
     def build_concept_hierarchy(self, cursor, scheme_conceptid):
+        """Collect the concepts below a scheme into a temporary table, with
+        the depth at which each is first reached, and return their count.
+
+        The hierarchy is walked one level at a time from the scheme only.
+        Concepts already collected are skipped, which both breaks cycles
+        and keeps polyhierarchies from multiplying paths: each concept is
+        visited once, at its minimal depth.
+        """
         cursor.execute(
             """
-            with recursive collection_hierarchy as (
-                select conceptidfrom as root_scheme,
-                    conceptidto as child,
-                    ARRAY[conceptidfrom] AS path,
-                    0 as depth
-                from relations
-                where not exists (
-                    select 1 from relations r2 where r2.conceptidto = relations.conceptidfrom
-                ) and relationtype != 'member'
-                union all
-                select ch.root_scheme,
-                    r.conceptidto,
-                    ch.path || r.conceptidfrom,
-                    ch.depth + 1
-                from collection_hierarchy ch
-                join relations r on ch.child = r.conceptidfrom
-                where relationtype != 'member'
-            )
-            select * 
-            from collection_hierarchy
-            where root_scheme = %s;
+            drop table if exists lingo_concept_hierarchy;
+            create temporary table lingo_concept_hierarchy (
+                concept uuid primary key,
+                depth integer not null
+            );
+            insert into lingo_concept_hierarchy (concept, depth)
+            select distinct conceptidto, 0
+            from relations
+            where conceptidfrom = %s and relationtype != 'member';
             """,
             (scheme_conceptid,),
         )
-        results = cursor.fetchall()
-        concept_hierarchy = []
-        concepts_to_migrate = []
-        for result in results:
-            concept_dict = {
-                "root_scheme": result[0],
-                "concept": result[1],
-                "path": result[2],
-                "depth": result[3],
-            }
-            concepts_to_migrate.append(result[1])
-            concept_hierarchy.append(concept_dict)
-        return concept_hierarchy, concepts_to_migrate
+        depth = 0
+        while cursor.rowcount:
+            depth += 1
+            cursor.execute(
+                """
+                insert into lingo_concept_hierarchy (concept, depth)
+                select distinct r.conceptidto, %s
+                from lingo_concept_hierarchy h
+                join relations r on r.conceptidfrom = h.concept
+                where h.depth = %s
+                    and r.relationtype != 'member'
+                    and r.conceptidto != %s
+                on conflict (concept) do nothing;
+                """,
+                (depth, depth - 1, scheme_conceptid),
+            )
+        cursor.execute("""select count(*) from lingo_concept_hierarchy;""")
+        return cursor.fetchone()[0]
 
-    def init_relationships(
-        self, cursor, loadid, concepts_to_migrate, concept_hierarchy
-    ):
+    def hierarchy_concept_ids(self, after=None):
+        """Yield the collected conceptids sorting after `after` (if given)
+        in sorted chunks of batch_size, read through a server-side cursor."""
+        with connection.chunked_cursor() as cursor:
+            cursor.execute(
+                """
+                select concept from lingo_concept_hierarchy
+                where %s::uuid is null or concept > %s::uuid
+                order by concept;
+                """,
+                (after, after),
+            )
+            while rows := cursor.fetchmany(self.batch_size):
+                yield [row[0] for row in rows]
+
+    def init_relationships(self, cursor, loadid, scheme_conceptid, checkpoint):
+        """Stage each kind of relationship as its own checkpointed step."""
+        checkpoint.run("top_concept_of", self.stage_top_concept_of, cursor, loadid)
+        checkpoint.run("broader", self.stage_broader_concepts, cursor, loadid)
+        return checkpoint.run(
+            "part_of_scheme", self.stage_part_of_scheme, cursor, scheme_conceptid
+        )
+
+    def stage_top_concept_of(self, cursor, loadid):
         # Create top concept of scheme relationships (derived from relations with 'hasTopConcept' relationtype)
         cursor.execute(
             """
@@ -367,16 +661,16 @@ class RDMMtoLingoMigrator(BaseImportModule):
                 'insert' as operation
             from relations
             where relationtype = 'hasTopConcept'
-            and conceptidto = ANY(%s);
+            and conceptidto in (select concept from lingo_concept_hierarchy);
         """,
             (
                 TOP_CONCEPT_OF_NODE_AND_NODEGROUP,
                 loadid,
                 TOP_CONCEPT_OF_NODE_AND_NODEGROUP,
-                concepts_to_migrate,
             ),
         )
 
+    def stage_broader_concepts(self, cursor, loadid):
         # Create broader relationships (derived from relations with 'narrower' relationtype)
         cursor.execute(
             """
@@ -419,7 +713,7 @@ class RDMMtoLingoMigrator(BaseImportModule):
                 'insert' as operation
             from relations
             where relationtype = 'narrower'
-            and conceptidto = ANY(%s);
+            and conceptidto in (select concept from lingo_concept_hierarchy);
         """,
             (
                 CLASSIFICATION_STATUS_ASCRIBED_CLASSIFICATION_NODEID,
@@ -433,75 +727,55 @@ class RDMMtoLingoMigrator(BaseImportModule):
                 CLASSIFICATION_STATUS_TIMESPAN_BEGIN_OF_BEGIN_NODEID,
                 loadid,
                 CLASSIFICATION_STATUS_NODEGROUP,
-                concepts_to_migrate,
             ),
         )
 
-        # Create Part of Scheme relationships - derived by recursively generating concept hierarchy & associating
-        # concepts with their schemes
-        part_of_scheme_tiles = []
-        part_of_scheme_nodegroup = NodeGroup.objects.get(
-            nodegroupid=CONCEPTS_PART_OF_SCHEME_NODEGROUP_ID
-        )
-        concepts_with_scheme = {}
-        for concept in concept_hierarchy:
-            root_scheme = str(concept["root_scheme"])
-            resourceinstanceid = concept["concept"]
-
-            concept_has_part_of_scheme = resourceinstanceid in concepts_with_scheme
-            existing_scheme = concepts_with_scheme.get(resourceinstanceid)
-            if not concept_has_part_of_scheme:
-                concepts_with_scheme[resourceinstanceid] = root_scheme
-            elif concept_has_part_of_scheme and existing_scheme == root_scheme:
-                continue
-            elif concept_has_part_of_scheme and existing_scheme != root_scheme:
-                return {
-                    "status": 400,
-                    "success": False,
-                    "title": "Concepts may only participate in one scheme",
-                    "message": _(
-                        "Concept {conceptid} cannot have multiple schemes: {current_scheme} and {existing_scheme}"
-                    ).format(
-                        {
-                            "conceptid": resourceinstanceid,
-                            "current_scheme": root_scheme,
-                            "existing_scheme": concepts_with_scheme[resourceinstanceid],
-                        }
-                    ),
-                }
-
-            value_obj = {
-                str(CONCEPTS_PART_OF_SCHEME_NODEGROUP_ID): {
-                    "notes": "",
-                    "valid": True,
-                    "value": [
-                        {
-                            "resourceId": root_scheme,
-                            "ontologyProperty": "",
-                            "resourceXresourceId": "",
-                            "inverseOntologyProperty": "",
-                        }
-                    ],
-                    "source": root_scheme,
-                    "datatype": "resource-instance",
-                }
-            }
-
-            staging_tile = LoadStaging(
-                value=value_obj,
-                resourceid=resourceinstanceid,
-                tileid=uuid.uuid4(),
-                passes_validation=True,
-                nodegroup_depth=0,
-                source_description="Concept: Part of Scheme",
-                load_event=LoadEvent(self.loadid),
-                nodegroup=part_of_scheme_nodegroup,
-                operation="insert",
+    def stage_part_of_scheme(self, cursor, scheme_conceptid):
+        # Create Part of Scheme relationships - associating every concept
+        # collected by build_concept_hierarchy() with its scheme
+        cursor.execute(
+            """
+           insert into load_staging(
+                value,
+                resourceid,
+                tileid,
+                passes_validation,
+                nodegroup_depth,
+                source_description,
+                loadid,
+                nodegroupid,
+                operation
             )
-            staging_tile.full_clean()
-            part_of_scheme_tiles.append(staging_tile)
-
-        LoadStaging.objects.bulk_create(part_of_scheme_tiles)
+            select
+                json_build_object(%s::uuid,
+                    json_build_object(
+                        'notes', '',
+                        'valid', true,
+                        'value', json_build_array(json_build_object('resourceId', %s::text, 'ontologyProperty', '', 'resourceXresourceId', '', 'inverseOntologyProperty', '')),
+                        'source', %s::text,
+                        'datatype', 'resource-instance'
+                    )
+                ) as value,
+                concept as resourceinstanceid, -- concepts keep their conceptid as resourceinstanceid
+                uuid_generate_v4() as tileid,
+                true as passes_validation,
+                0 as nodegroup_depth,
+                'Concept: Part of Scheme' as source_description,
+                %s::uuid as loadid,
+                %s::uuid as nodegroupid,
+                'insert' as operation
+            from lingo_concept_hierarchy;
+        """,
+            (
+                CONCEPTS_PART_OF_SCHEME_NODEGROUP_ID,
+                str(scheme_conceptid),
+                str(scheme_conceptid),
+                self.loadid,
+                CONCEPTS_PART_OF_SCHEME_NODEGROUP_ID,
+            ),
+        )
+        # Concepts already staged under another scheme of this load
+        return self.check_scheme_conflicts(cursor, self.loadid)
 
     def start(self, request):
         load_details = {"operation": "RDM to Lingo Migration"}
@@ -531,10 +805,60 @@ class RDMMtoLingoMigrator(BaseImportModule):
         message = "load event created"
         return {"success": True, "data": message}
 
+    def check_scheme_conflicts(self, cursor, loadid):
+        """Concepts staged as part of more than one scheme, e.g. by the
+        parallel stages of a multi-scheme load."""
+        cursor.execute(
+            """
+            select resourceid, array_agg(distinct value -> %s ->> 'source')
+            from load_staging
+            where loadid = %s and nodegroupid = %s
+            group by resourceid
+            having count(distinct value -> %s ->> 'source') > 1
+            limit 1;
+            """,
+            (
+                str(CONCEPTS_PART_OF_SCHEME_NODEGROUP_ID),
+                loadid,
+                CONCEPTS_PART_OF_SCHEME_NODEGROUP_ID,
+                str(CONCEPTS_PART_OF_SCHEME_NODEGROUP_ID),
+            ),
+        )
+        if conflict := cursor.fetchone():
+            conceptid, (current_scheme, existing_scheme, *_others) = conflict
+            return {
+                "status": 400,
+                "success": False,
+                "title": "Concepts may only participate in one scheme",
+                "message": _(
+                    "Concept {conceptid} cannot have multiple schemes: {current_scheme} and {existing_scheme}"
+                ).format(
+                    conceptid=conceptid,
+                    current_scheme=current_scheme,
+                    existing_scheme=existing_scheme,
+                ),
+            }
+        return None
+
     def write(self, request):
         self.loadid = request.POST.get("loadid")
         self.scheme_conceptid = request.POST.get("scheme")
-        if models.Concept.objects.count() < 500:
+        self.scheme_conceptids = request.POST.getlist("scheme")
+        with connection.cursor() as cursor:
+            # Recorded for resume_load()
+            cursor.execute(
+                """UPDATE load_event SET load_details = load_details || jsonb_build_object('schemes', %s::jsonb) WHERE loadid = %s""",
+                (json.dumps(self.scheme_conceptids), self.loadid),
+            )
+        run_synchronously = self.fits_time_budget(self.scheme_conceptids)
+        if len(self.scheme_conceptids) > 1:
+            if run_synchronously:
+                self.run_multi_scheme_load_task(
+                    self.userid, self.loadid, self.scheme_conceptids
+                )
+            else:
+                self.run_multi_scheme_load_task_async(request, self.loadid)
+        elif run_synchronously:
             response = self.run_load_task(
                 self.userid, self.loadid, self.scheme_conceptid
             )
@@ -543,63 +867,205 @@ class RDMMtoLingoMigrator(BaseImportModule):
         message = "Schemes and Concept Migration to Lingo Models Complete"
         return {"success": True, "data": message}
 
+    def resume_load(self, userid, loadid):
+        """Rerun an interrupted or failed load, skipping the steps it
+        already finished."""
+        load_event = LoadEvent.objects.get(pk=loadid)
+        scheme_conceptids = (load_event.load_details or {}).get("schemes", [])
+        if not scheme_conceptids:
+            return {
+                "status": 400,
+                "success": False,
+                "title": _("Unable to resume migration"),
+                "message": _("Load {loadid} has no recorded schemes to resume.").format(
+                    loadid=loadid
+                ),
+            }
+        load_event.status = "running"
+        load_event.load_end_time = None
+        load_event.save()
+
+        if len(scheme_conceptids) > 1:
+            return self.run_multi_scheme_load_task(userid, loadid, scheme_conceptids)
+        return self.run_load_task(userid, loadid, scheme_conceptids[0])
+
+    def fits_time_budget(self, scheme_conceptids):
+        """Whether migrating these schemes is expected to finish within
+        LINGO_MIGRATION_SYNC_TIME_BUDGET seconds, judged from the concepts
+        and values of their own hierarchies. Counting stops at the budget,
+        so estimating a huge scheme is no slower than a small one."""
+        budget = getattr(settings, "LINGO_MIGRATION_SYNC_TIME_BUDGET", 10)
+        concept_cap = int(budget / SECONDS_PER_CONCEPT) + 1
+        value_cap = int(budget / SECONDS_PER_VALUE) + 1
+        with connection.cursor() as cursor:
+            # The recursion is evaluated lazily, so the limit ends it early.
+            cursor.execute(
+                """
+                with recursive hierarchy(conceptid) as (
+                    select unnest(%s::uuid[])
+                    union
+                    select r.conceptidto
+                    from hierarchy h
+                    join relations r on r.conceptidfrom = h.conceptid
+                    where r.relationtype != 'member'
+                ),
+                capped as (
+                    select conceptid from hierarchy limit %s
+                )
+                select
+                    (select count(*) from capped),
+                    (
+                        select count(*) from (
+                            select 1 from "values"
+                            where conceptid in (select conceptid from capped)
+                            limit %s
+                        ) capped_values
+                    );
+                """,
+                (scheme_conceptids, concept_cap, value_cap),
+            )
+            concept_count, value_count = cursor.fetchone()
+        estimate = concept_count * SECONDS_PER_CONCEPT + value_count * SECONDS_PER_VALUE
+        return estimate <= budget
+
     def run_load_task(self, userid, loadid, scheme_conceptid):
         self.loadid = loadid  # currently redundant, but be certain
         self.scheme_conceptid = scheme_conceptid
 
         with connection.cursor() as cursor:
+            if error := self.stage_scheme(cursor, scheme_conceptid):
+                self.fail_load(cursor, loadid)
+                return error
+            return self.save_load(cursor, userid, loadid)
 
-            # Gather and load schemes and concepts
-            schemes_nodegroup_lookup, schemes_nodes = self.get_graph_tree(
-                SCHEMES_GRAPH_ID
-            )
-            schemes_node_lookup = self.get_node_lookup(schemes_nodes)
-            self.etl_schemes(
-                cursor, schemes_nodegroup_lookup, schemes_node_lookup, scheme_conceptid
-            )
+    def run_multi_scheme_load_task(self, userid, loadid, scheme_conceptids):
+        """Stage each scheme on its own connection, in parallel, then
+        validate and save them together as one load."""
+        self.loadid = loadid
 
-            concepts_nodegroup_lookup, concepts_nodes = self.get_graph_tree(
-                CONCEPTS_GRAPH_ID
-            )
-            concepts_node_lookup = self.get_node_lookup(concepts_nodes)
-            # Prefetch concept hierarchy to avoid building it multiple times
-            concept_hierarchy, concepts_to_migrate = self.build_concept_hierarchy(
-                cursor, self.scheme_conceptid
-            )
-            self.etl_concepts(
-                cursor,
-                concepts_nodegroup_lookup,
-                concepts_node_lookup,
-                concepts_to_migrate,
+        workers = getattr(settings, "LINGO_MIGRATION_WORKERS", 4)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = list(
+                executor.map(self.stage_scheme_on_own_connection, scheme_conceptids)
             )
+        return self.finish_multi_scheme_load(userid, loadid, results)
 
-            # Create relationships
-            self.init_relationships(
-                cursor, loadid, concepts_to_migrate, concept_hierarchy
-            )
+    def finish_multi_scheme_load(self, userid, loadid, results):
+        with connection.cursor() as cursor:
+            errors = [result for result in results if result]
+            if errors or (error := self.check_scheme_conflicts(cursor, loadid)):
+                self.fail_load(cursor, loadid)
+                return errors[0] if errors else error
+            return self.save_load(cursor, userid, loadid)
 
-            # Validate and save to tiles
-            validation = self.validate(loadid)
-            if len(validation["data"]) == 0:
-                cursor.execute(
-                    """UPDATE load_event SET status = %s WHERE loadid = %s""",
-                    ("validated", loadid),
-                )
-                response = save_to_tiles(userid, loadid)
-                cursor.execute(
-                    """CALL __arches_update_resource_x_resource_with_graphids();"""
-                )
-                cursor.execute("""SELECT __arches_refresh_spatial_views();""")
-                refresh_successful = cursor.fetchone()[0]
-                if not refresh_successful:
-                    raise Exception("Unable to refresh spatial views")
-                return response
-            else:
-                cursor.execute(
-                    """UPDATE load_event SET status = %s, load_end_time = %s WHERE loadid = %s""",
-                    ("failed", datetime.now(), loadid),
+    def stage_scheme_on_own_connection(self, scheme_conceptid):
+        # Django connections are per thread: close this one when done.
+        try:
+            with connection.cursor() as cursor:
+                return self.stage_scheme(cursor, scheme_conceptid)
+        finally:
+            connection.close()
+
+    def stage_scheme(self, cursor, scheme_conceptid):
+        """Stage the tiles of one scheme and its concepts under this load,
+        skipping steps finished by an earlier run of the same load.
+        Returns an error response, or None on success. Raises
+        MigrationInProgress if another run is staging the scheme."""
+        with migration_lock(cursor, self.loadid, scheme_conceptid):
+            return self.stage_scheme_steps(cursor, scheme_conceptid)
+
+    def stage_scheme_steps(self, cursor, scheme_conceptid):
+        checkpoint = MigrationCheckpoint(cursor, self.loadid, scheme_conceptid)
+        if checkpoint.is_done("part_of_scheme"):
+            return None
+
+        # Gather and load schemes and concepts
+        schemes_nodegroup_lookup, schemes_nodes = self.get_graph_tree(SCHEMES_GRAPH_ID)
+        schemes_node_lookup = self.get_node_lookup(schemes_nodes)
+        checkpoint.run(
+            "scheme",
+            self.etl_schemes,
+            cursor,
+            schemes_nodegroup_lookup,
+            schemes_node_lookup,
+            scheme_conceptid,
+        )
+
+        concepts_nodegroup_lookup, concepts_nodes = self.get_graph_tree(
+            CONCEPTS_GRAPH_ID
+        )
+        concepts_node_lookup = self.get_node_lookup(concepts_nodes)
+        # Prefetch concept hierarchy to avoid building it multiple times
+        concept_count = self.build_concept_hierarchy(cursor, scheme_conceptid)
+        self.etl_concepts(
+            cursor,
+            concepts_nodegroup_lookup,
+            concepts_node_lookup,
+            concept_count,
+            checkpoint,
+        )
+
+        # Create relationships
+        return self.init_relationships(
+            cursor, self.loadid, scheme_conceptid, checkpoint
+        )
+
+    def save_load(self, cursor, userid, loadid):
+        """Validate and save the staged tiles. Raises MigrationInProgress if
+        another run is saving this load. Runs still staging its schemes
+        (whose redelivered tasks may complete a chord early) are waited
+        for, and the load fails unless they finished staging."""
+        with migration_lock(cursor, loadid), ExitStack() as staging:
+            load_event = LoadEvent.objects.get(pk=loadid)
+            for scheme_conceptid in (load_event.load_details or {}).get("schemes", []):
+                staging.enter_context(
+                    migration_lock(cursor, loadid, scheme_conceptid, wait=True)
                 )
-                return {"success": False, "data": "failed"}
+                checkpoint = MigrationCheckpoint(cursor, loadid, scheme_conceptid)
+                if not checkpoint.is_done("part_of_scheme"):
+                    self.fail_load(cursor, loadid)
+                    return {
+                        "status": 400,
+                        "success": False,
+                        "title": _("Unable to save migration"),
+                        "message": _(
+                            "Scheme {scheme_conceptid} was not fully staged."
+                        ).format(scheme_conceptid=scheme_conceptid),
+                    }
+            return self.save_staged_tiles(cursor, userid, loadid)
+
+    def save_staged_tiles(self, cursor, userid, loadid):
+        self.check_staged_tiles(cursor)
+
+        # Validate and save to tiles
+        validation = self.validate(loadid)
+        if len(validation["data"]) == 0:
+            cursor.execute(
+                """UPDATE load_event SET status = %s WHERE loadid = %s""",
+                ("validated", loadid),
+            )
+            response = save_to_tiles(userid, loadid)
+            cursor.execute(
+                """CALL __arches_update_resource_x_resource_with_graphids();"""
+            )
+            cursor.execute("""SELECT __arches_refresh_spatial_views();""")
+            refresh_successful = cursor.fetchone()[0]
+            if not refresh_successful:
+                raise Exception("Unable to refresh spatial views")
+            if response.get("success"):
+                # Tiles saved in SQL fire no signals to patch the concept
+                # cache, so publish it anew.
+                ConceptBuilder(read_cache=False).rebuild_cache()
+            return response
+        else:
+            self.fail_load(cursor, loadid)
+            return {"success": False, "data": "failed"}
+
+    def fail_load(self, cursor, loadid):
+        cursor.execute(
+            """UPDATE load_event SET status = %s, load_end_time = %s WHERE loadid = %s""",
+            ("failed", datetime.now(), loadid),
+        )
 
     @load_data_async
     def run_load_task_async(self, request):
@@ -611,3 +1077,16 @@ class RDMMtoLingoMigrator(BaseImportModule):
                 """UPDATE load_event SET taskid = %s WHERE loadid = %s""",
                 (migrate_rdm_to_lingo_task.task_id, self.loadid),
             )
+
+    @load_data_async
+    def run_multi_scheme_load_task_async(self, request):
+        # One staging subtask per scheme, joined by a task that saves them.
+        migrate_rdm_to_lingo_task = chord(
+            tasks.stage_scheme_for_lingo_task.s(self.loadid, scheme_conceptid)
+            for scheme_conceptid in self.scheme_conceptids
+        )(tasks.finish_multi_scheme_lingo_migration_task.s(self.userid, self.loadid))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                """UPDATE load_event SET taskid = %s WHERE loadid = %s""",
+                (migrate_rdm_to_lingo_task.task_id, self.loadid),
+            )
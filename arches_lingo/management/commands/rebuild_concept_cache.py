@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from arches_lingo.utils.concept_builder import ConceptBuilder
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the concept hierarchy cache and report how long it took. "
+        "Run after writing concept or scheme tiles other than through the "
+        "ORM or an RDM migration (e.g. in SQL), which the cache does not see."
+    )
+
+    def handle(self, *args, **options):
+        builder = ConceptBuilder(read_cache=False)
+        start = time.monotonic()
+        builder.rebuild_cache()
+        elapsed = time.monotonic() - start
+
+        self.stdout.write(
+            f"Rebuilt {len(builder.labels)} concepts, "
+            f"{len(builder.graph.broader.targets)} broader relations and "
+            f"{len(builder.schemes)} schemes in {elapsed:.2f} seconds."
+        )
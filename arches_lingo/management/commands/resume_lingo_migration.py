@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from arches.app.models.models import LoadEvent
+
+from arches_lingo.etl_modules.migrate_to_lingo import (
+    MigrationInProgress,
+    RDMMtoLingoMigrator,
+)
+
+
+class Command(BaseCommand):
+    help = "Rerun an RDM to Lingo migration, skipping the steps it already finished."
+
+    def add_arguments(self, parser):
+        parser.add_argument("loadid", help="loadid of the migration to resume")
+
+    def handle(self, *args, **options):
+        loadid = options["loadid"]
+        load_event = LoadEvent.objects.get(pk=loadid)
+        migrator = RDMMtoLingoMigrator(loadid=loadid)
+        try:
+            result = migrator.resume_load(load_event.user_id, loadid)
+        except MigrationInProgress as e:
+            raise CommandError(e)
+        if result and result.get("success") is False and "message" in result:
+            raise CommandError(result["message"])
+
+        load_event.refresh_from_db()
+        for scheme_conceptid, checkpoint in load_event.load_details.get(
+            "checkpoints", {}
+        ).items():
+            self.stdout.write(
+                f"Scheme {scheme_conceptid}: {checkpoint['percent_complete']}% staged"
+            )
+        self.stdout.write(f"Load {loadid}: {load_event.status}")
@@ -0,0 +1,41 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from arches.app.models import models
+
+from arches_lingo.etl_modules.migrate_to_lingo import (
+    CONCEPT_VALUE_TILES,
+    RDMMtoLingoMigrator,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Time transforming RDM concept values into Lingo tiles, apart from "
+        "reading them."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--limit", type=int, default=100_000, help="number of values to read"
+        )
+
+    def handle(self, *args, **options):
+        values = models.Value.objects.filter(concept__nodetype="Concept")
+        start = time.monotonic()
+        rows = list(RDMMtoLingoMigrator.value_rows(values)[: options["limit"]])
+        read = time.monotonic() - start
+
+        start = time.monotonic()
+        concepts = RDMMtoLingoMigrator.transform_values(
+            rows, "Concept", CONCEPT_VALUE_TILES
+        )
+        transformed = time.monotonic() - start
+
+        tile_count = sum(len(concept["tile_data"]) for concept in concepts)
+        self.stdout.write(
+            f"Read {len(rows)} values in {read:.2f} seconds, and transformed "
+            f"them into {tile_count} tiles of {len(concepts)} concepts in "
+            f"{transformed:.2f} seconds."
+        )
@@ -0,0 +1,114 @@
+import textwrap
+
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+from arches_lingo.const import CONCEPT_NAME_CONTENT_NODE, CONCEPT_NAME_NODEGROUP
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("arches_lingo", "0002_load_lingo_lists"),
+    ]
+
+    forward = textwrap.dedent(
+        f"""
+    CREATE TABLE arches_lingo__label_index (
+        tileid uuid PRIMARY KEY,
+        conceptid uuid NOT NULL,
+        value text NOT NULL
+    );
+
+    INSERT INTO arches_lingo__label_index (tileid, conceptid, value)
+    SELECT
+        t.tileid,
+        t.resourceinstanceid,
+        t.tiledata ->> '{CONCEPT_NAME_CONTENT_NODE}'
+    FROM
+        tiles t
+    WHERE
+        t.nodegroupid = '{CONCEPT_NAME_NODEGROUP}'
+        AND t.tiledata ->> '{CONCEPT_NAME_CONTENT_NODE}' IS NOT NULL;
+
+    CREATE INDEX arches_lingo__label_index_conceptid_idx
+        ON arches_lingo__label_index (conceptid);
+    CREATE INDEX arches_lingo__label_index_value_idx
+        ON arches_lingo__label_index (value);
+    CREATE INDEX arches_lingo__label_index_length_idx
+        ON arches_lingo__label_index (LENGTH(value));
+    CREATE INDEX arches_lingo__label_index_trgm_idx
+        ON arches_lingo__label_index USING gin (UPPER(value) gin_trgm_ops);
+
+    CREATE FUNCTION __arches_lingo_refresh_label_index()
+    RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            DELETE FROM arches_lingo__label_index WHERE tileid = OLD.tileid;
+        END IF;
+        IF TG_OP IN ('INSERT', 'UPDATE')
+            AND NEW.nodegroupid = '{CONCEPT_NAME_NODEGROUP}'
+            AND NEW.tiledata ->> '{CONCEPT_NAME_CONTENT_NODE}' IS NOT NULL
+        THEN
+            INSERT INTO arches_lingo__label_index (tileid, conceptid, value)
+            VALUES (
+                NEW.tileid,
+                NEW.resourceinstanceid,
+                NEW.tiledata ->> '{CONCEPT_NAME_CONTENT_NODE}'
+            );
+        END IF;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql;
+
+    CREATE TRIGGER __arches_lingo_label_index_insert
+        AFTER INSERT ON tiles
+        FOR EACH ROW
+        WHEN (NEW.nodegroupid = '{CONCEPT_NAME_NODEGROUP}')
+        EXECUTE FUNCTION __arches_lingo_refresh_label_index();
+    CREATE TRIGGER __arches_lingo_label_index_update
+        AFTER UPDATE ON tiles
+        FOR EACH ROW
+        WHEN (
+            OLD.nodegroupid = '{CONCEPT_NAME_NODEGROUP}'
+            OR NEW.nodegroupid = '{CONCEPT_NAME_NODEGROUP}'
+        )
+        EXECUTE FUNCTION __arches_lingo_refresh_label_index();
+    CREATE TRIGGER __arches_lingo_label_index_delete
+        AFTER DELETE ON tiles
+        FOR EACH ROW
+        WHEN (OLD.nodegroupid = '{CONCEPT_NAME_NODEGROUP}')
+        EXECUTE FUNCTION __arches_lingo_refresh_label_index();
+
+    CREATE OR REPLACE VIEW arches_lingo__vw_label_values AS (
+    SELECT
+        conceptid,
+        value
+    FROM
+        arches_lingo__label_index
+    );"""
+    )
+
+    reverse = textwrap.dedent(
+        f"""
+    CREATE OR REPLACE VIEW arches_lingo__vw_label_values AS (
+    SELECT
+        t.resourceinstanceid AS conceptid,
+        t.tiledata ->> '{CONCEPT_NAME_CONTENT_NODE}' AS value
+    FROM
+        tiles t
+    ORDER BY
+        conceptid
+    );
+
+    DROP TRIGGER __arches_lingo_label_index_insert ON tiles;
+    DROP TRIGGER __arches_lingo_label_index_update ON tiles;
+    DROP TRIGGER __arches_lingo_label_index_delete ON tiles;
+    DROP FUNCTION __arches_lingo_refresh_label_index();
+    DROP TABLE arches_lingo__label_index;"""
+    )
+
+    operations = [
+        TrigramExtension(),
+        migrations.RunSQL(forward, reverse),
+    ]
@@ -0,0 +1,16 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("arches_lingo", "0003_label_index"),
+    ]
+
+    operations = [
+        # Versions of the concept snapshot published in the "lingo" cache
+        migrations.RunSQL(
+            "CREATE SEQUENCE arches_lingo__snapshot_version_seq;",
+            "DROP SEQUENCE arches_lingo__snapshot_version_seq;",
+        ),
+    ]
@@ -4,6 +4,7 @@ Django settings for arches_lingo project.
 
 import os
 import inspect
+import tempfile
 import semantic_version
 from datetime import datetime, timedelta
 from django.core.exceptions import ImproperlyConfigured
@@ -361,13 +362,58 @@ DATA_UPLOAD_MAX_MEMORY_SIZE = 15728640
 # Unique session cookie ensures that logins are treated separately for each app
 SESSION_COOKIE_NAME = "arches_lingo"
 
+# Upper bound on the optional total returned by cursor-paginated label searches
+LINGO_SEARCH_COUNT_CAP = 1000
+
+# Where label searches compute edit distances: "database" (Postgres) or
+# "memory" (an index of the cached concept labels in each worker process)
+LINGO_SEARCH_BACKEND = "database"
+
+# Largest edit distance the "memory" backend indexes. Its index grows
+# steeply with the distance; searches beyond it go to the database.
+LINGO_SEARCH_MEMORY_MAX_EDIT_DISTANCE = 2
+
+# Label search responses kept per worker process, until a concept or scheme
+# changes
+LINGO_SEARCH_RESULT_CACHE_SIZE = 256
+
+# Schemes staged in parallel by a synchronous multi-scheme RDM migration
+LINGO_MIGRATION_WORKERS = 4
+
+# Concepts extracted, transformed and staged per chunk by the RDM migration
+LINGO_MIGRATION_BATCH_SIZE = 1000
+
+# RDM migrations expected to take longer than this many seconds run in
+# Celery rather than in the request
+LINGO_MIGRATION_SYNC_TIME_BUDGET = 10
+
+# Directory of the "lingo" cache, which holds the concept snapshot shared by
+# this host's worker processes. Keep it outside the installed package, on
+# storage every worker can write to. To share one snapshot across hosts,
+# point it at shared storage or give CACHES["lingo"] a shared backend
+# (e.g. Redis) instead. The default is scoped to this project and database,
+# so deployments on one host never serve each other's concepts.
+# The snapshot is refreshed by tile saves made through the ORM and by RDM
+# migrations; after writing tiles any other way (SQL, other ETL modules),
+# run `python manage.py rebuild_concept_cache`.
+LINGO_CACHE_LOCATION = get_optional_env_variable(
+    "ARCHES_LINGO_CACHE_LOCATION",
+    os.path.join(tempfile.gettempdir(), "arches_lingo", f"{APP_NAME}_{DB_NAME}"),
+)
+
 # For more info on configuring your cache: https://docs.djangoproject.com/en/2.2/topics/cache/
 CACHES = {
     "default": {
         "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
     },
+    # Shared by all worker processes, which each keep an unpickled copy of the
+    # concept snapshot until a newer version is published. Entries are written
+    # without expiry: versions, not timeouts, retire them. Keys are prefixed
+    # with the database name in case the location or backend is shared.
     "lingo": {
-        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": LINGO_CACHE_LOCATION,
+        "KEY_PREFIX": DB_NAME,
     },
     "user_permission": {
         "BACKEND": "django.core.cache.backends.db.DatabaseCache",
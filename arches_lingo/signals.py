@@ -0,0 +1,37 @@
+import logging
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from arches.app.models.models import TileModel
+from arches.app.models.tile import Tile
+
+from arches_lingo.utils.concept_builder import ConceptBuilder
+
+logger = logging.getLogger(__name__)
+
+
+@receiver(post_save, sender=TileModel)
+@receiver(post_save, sender=Tile)
+@receiver(post_delete, sender=TileModel)
+@receiver(post_delete, sender=Tile)
+def update_concept_cache(sender, instance, **kwargs):
+    """Patch the concept cache once the tile change has been committed."""
+    nodegroup_id = str(instance.nodegroup_id)
+    if nodegroup_id not in ConceptBuilder.TRACKED_NODEGROUPS:
+        return
+    resourceid = str(instance.resourceinstance_id)
+
+    def publish():
+        # The tile is already saved: a failure here mustn't fail the request.
+        try:
+            ConceptBuilder.update_cache_for_tile(resourceid, nodegroup_id)
+        except Exception:
+            logger.exception(
+                "Unable to patch the concept cache for resource %s; "
+                "run rebuild_concept_cache to refresh it",
+                resourceid,
+            )
+
+    transaction.on_commit(publish, robust=True)
@@ -1,13 +1,17 @@
 import logging
 from celery import shared_task
 from django.contrib.auth.models import User
+from django.db import connection
 from django.utils.translation import gettext as _
 from arches.app.models import models
 from arches_lingo.etl_modules import migrate_to_lingo
 from arches.app.tasks import notify_completion
 
 
-@shared_task
+# Redelivered if the worker dies mid-migration; the rerun resumes from the
+# load's checkpoints. A redelivery while the first run is still going (e.g.
+# past a Redis or SQS visibility timeout) finds the load locked and exits.
+@shared_task(acks_late=True, reject_on_worker_lost=True)
 def migrate_rdm_to_lingo_task(userid, loadid, scheme_conceptid):
     logger = logging.getLogger(__name__)
 
@@ -17,13 +21,65 @@ def migrate_rdm_to_lingo_task(userid, loadid, scheme_conceptid):
 
         load_event = models.LoadEvent.objects.get(loadid=loadid)
         status = _("Completed") if load_event.status == "indexed" else _("Failed")
+    except migrate_to_lingo.MigrationInProgress as e:
+        # Redelivered while another delivery still runs: leave the load, and
+        # reporting on it, to that run.
+        logger.warning(e)
+        return
     except Exception as e:
         logger.error(e)
         load_event = models.LoadEvent.objects.get(loadid=loadid)
         load_event.status = "failed"
         load_event.save()
         status = _("Failed")
-    finally:
-        msg = _("RDM to Lingo Migration: [{}]").format(status)
-        user = User.objects.get(id=userid)
-        notify_completion(msg, user)
+
+    msg = _("RDM to Lingo Migration: [{}]").format(status)
+    user = User.objects.get(id=userid)
+    notify_completion(msg, user)
+
+
+@shared_task(acks_late=True, reject_on_worker_lost=True)
+def stage_scheme_for_lingo_task(loadid, scheme_conceptid):
+    """Stage one scheme of a multi-scheme migration; errors are returned
+    rather than raised so that the joining task still runs."""
+    logger = logging.getLogger(__name__)
+
+    try:
+        Migrator = migrate_to_lingo.RDMMtoLingoMigrator(loadid=loadid)
+        with connection.cursor() as cursor:
+            return Migrator.stage_scheme(cursor, scheme_conceptid)
+    except migrate_to_lingo.MigrationInProgress as e:
+        # Redelivered while another delivery still stages the scheme, which
+        # the joining task waits for.
+        logger.warning(e)
+        return None
+    except Exception as e:
+        logger.error(e)
+        return {"success": False, "data": str(e)}
+
+
+@shared_task
+def finish_multi_scheme_lingo_migration_task(results, userid, loadid):
+    logger = logging.getLogger(__name__)
+
+    try:
+        Migrator = migrate_to_lingo.RDMMtoLingoMigrator(loadid=loadid)
+        Migrator.finish_multi_scheme_load(userid, loadid, results)
+
+        load_event = models.LoadEvent.objects.get(loadid=loadid)
+        status = _("Completed") if load_event.status == "indexed" else _("Failed")
+    except migrate_to_lingo.MigrationInProgress as e:
+        # Redelivered while another delivery still runs: leave the load, and
+        # reporting on it, to that run.
+        logger.warning(e)
+        return
+    except Exception as e:
+        logger.error(e)
+        load_event = models.LoadEvent.objects.get(loadid=loadid)
+        load_event.status = "failed"
+        load_event.save()
+        status = _("Failed")
+
+    msg = _("RDM to Lingo Migration: [{}]").format(status)
+    user = User.objects.get(id=userid)
+    notify_completion(msg, user)
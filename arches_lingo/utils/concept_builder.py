@@ -1,7 +1,13 @@
-from collections import defaultdict
+from contextlib import contextmanager
+import json
+import logging
+import time
+from typing import Iterator
 
+from django.contrib.postgres.aggregates import ArrayAgg
 from django.contrib.postgres.expressions import ArraySubquery
 from django.core.cache import caches
+from django.db import connection
 from django.db.models import CharField, F, OuterRef, Value
 from django.db.models.expressions import CombinedExpression
 from django.utils.translation import gettext as _
@@ -23,70 +29,394 @@ from arches_lingo.const import (
     SCHEME_NAME_TYPE_NODE,
 )
 
+from arches_lingo.utils.concept_graph import ConceptGraph
 from arches_lingo.utils.query_expressions import JsonbArrayElements
 
 
 TOP_CONCEPT_OF_LOOKUP = f"data__{TOP_CONCEPT_OF_NODE_AND_NODEGROUP}"
 BROADER_LOOKUP = f"data__{CLASSIFICATION_STATUS_ASCRIBED_CLASSIFICATION_NODEID}"
 
+# Attributes of the builder persisted in each snapshot.
+SNAPSHOT_ATTRIBUTES = ["graph", "schemes", "labels"]
+SNAPSHOT_KEY = "snapshot"
+SNAPSHOT_VERSION_KEY = "snapshot_version"
+# Version of the full snapshot, the versions of the deltas published on top
+# of it, and those of the deltas it folded in (retired by the next one).
+SNAPSHOT_BASE_KEY = "snapshot_base"
+# Deltas published on top of the full snapshot before it is rewritten.
+MAX_DELTAS = 100
+# Name of the Postgres advisory lock held while publishing.
+SNAPSHOT_LOCK = "arches_lingo_concept_snapshot"
+# Set by an edit that couldn't take the lock, for the next rebuild to cover.
+SNAPSHOT_STALE_KEY = "snapshot_stale"
+# Seconds an edit waits for another publisher before leaving its change to
+# the next rebuild: long enough for other edits, short of a rebuild.
+LOCK_WAIT = 1.0
+
+# Rows fetched per round trip from server-side cursors during a rebuild.
+CHUNK_SIZE = 10_000
+
 cache = caches["lingo"]
+logger = logging.getLogger(__name__)
+
+# This process's copy of the most recently read snapshot.
+_local_snapshot = None
+
+
+def delta_key(version: int) -> str:
+    return f"snapshot_delta_{version}"
+
+
+@contextmanager
+def snapshot_lock(*, wait=True):
+    """Serialize publishing between all processes (and hosts) sharing the
+    database. Session-level, so it is released on exit even inside an
+    outer transaction; a process may take it again while holding it.
+    With `wait` False, give up after LOCK_WAIT seconds: yields whether
+    the lock was taken."""
+    with connection.cursor() as cursor:
+        if wait:
+            cursor.execute("SELECT pg_advisory_lock(hashtext(%s))", [SNAPSHOT_LOCK])
+            locked = True
+        else:
+            deadline = time.monotonic() + LOCK_WAIT
+            while True:
+                cursor.execute(
+                    "SELECT pg_try_advisory_lock(hashtext(%s))", [SNAPSHOT_LOCK]
+                )
+                locked = cursor.fetchone()[0]
+                if locked or time.monotonic() >= deadline:
+                    break
+                time.sleep(0.05)
+        try:
+            yield locked
+        finally:
+            if locked:
+                cursor.execute(
+                    "SELECT pg_advisory_unlock(hashtext(%s))", [SNAPSHOT_LOCK]
+                )
 
 
 class ConceptBuilder:
-    def __init__(self):
-        self.schemes = ResourceInstance.objects.none()
+    # Nodegroups whose tiles feed the cached maps.
+    TRACKED_NODEGROUPS = {
+        TOP_CONCEPT_OF_NODE_AND_NODEGROUP,
+        CLASSIFICATION_STATUS_NODEGROUP,
+        CONCEPT_NAME_NODEGROUP,
+        SCHEME_NAME_NODEGROUP,
+    }
 
-        # key=scheme resourceid (str) val=set of concept resourceids (str)
-        self.top_concepts: dict[str : set[str]] = defaultdict(set)
-        # key=concept resourceid (str) val=set of concept resourceids (str)
-        self.narrower_concepts: dict[str : set[str]] = defaultdict(set)
-        # key=resourceid (str) val=list of label dicts
-        self.labels: dict[str : list[dict]] = defaultdict(set)
+    def __init__(self, *, read_cache=True):
+        self.version = None
+        # key=scheme resourceid (str) val=list of serialized label dicts
+        self.schemes: dict[str : list[dict]] = {}
 
-        # Maps representing a reverse (leaf-first) tree
-        # key=resourceid (str) val=set of concept resourceids (str)
-        self.broader_concepts: dict[str : set[str]] = defaultdict(set)
-        # key=resourceid (str) val=set of scheme resourceids (str)
-        self.schemes_by_top_concept: dict[str : set[str]] = defaultdict(set)
+        # Hierarchy of schemes and concepts, keyed by interned integers.
+        self.graph = ConceptGraph()
+        # key=resourceid (str) val=list of serialized label dicts
+        self.labels: dict[str : list[dict]] = {}
 
-        self.read_from_cache()
+        if read_cache and not self.read_from_cache():
+            self.rebuild_cache(unless_published=True)
 
         # Not currently cached because written to during serialization.
         self.polyhierarchical_concepts = set()
 
-    def read_from_cache(self):
-        from_cache = cache.get_many(
-            [
-                "top_concepts",
-                "narrower_concepts",
-                "schemes",
-                "labels",
-                "broader_concepts",
-                "schemes_by_top_concept",
+    def read_from_cache(self) -> bool:
+        snapshot = self.get_snapshot()
+        if snapshot is None:
+            return False
+        self.load_snapshot(snapshot)
+        return True
+
+    @staticmethod
+    def get_snapshot():
+        """Return the published snapshot, or None if there isn't one.
+
+        Only the (small) version key is fetched per call. The full snapshot
+        is unpickled once per process; after that, the deltas published by
+        edits are applied to this process's copy until it catches up.
+        """
+        global _local_snapshot
+
+        version = ConceptBuilder.published_version()
+        if version is None:
+            return None
+        snapshot = _local_snapshot
+        deltas = None
+        if snapshot is not None:
+            deltas = ConceptBuilder.deltas_between(snapshot["version"], version)
+        if deltas is None:
+            snapshot = cache.get(SNAPSHOT_KEY)
+            if snapshot is None:
+                return None
+            if snapshot["version"] > version:
+                # Published ahead of its version key: already the newest.
+                deltas = []
+            else:
+                deltas = ConceptBuilder.deltas_between(snapshot["version"], version)
+            if deltas is None:
+                return None
+        if deltas:
+            snapshot = ConceptBuilder.apply_deltas(snapshot, deltas)
+        _local_snapshot = snapshot
+        return snapshot
+
+    @staticmethod
+    def published_version() -> int | None:
+        """Version of the published snapshot, without loading it, or None
+        if there isn't one or an edit left it for the next rebuild."""
+        published = cache.get_many([SNAPSHOT_VERSION_KEY, SNAPSHOT_STALE_KEY])
+        if published.get(SNAPSHOT_STALE_KEY):
+            return None
+        return published.get(SNAPSHOT_VERSION_KEY)
+
+    @staticmethod
+    def deltas_between(since: int, until: int) -> list[dict] | None:
+        """The deltas published after version `since` up to `until`, oldest
+        first, or None if they don't chain back to `since` (retired, or
+        replaced by a full rebuild)."""
+        deltas = []
+        version = until
+        while version != since:
+            if version < since:
+                return None
+            delta = cache.get(delta_key(version))
+            if delta is None:
+                return None
+            deltas.append(delta)
+            version = delta["previous"]
+        deltas.reverse()
+        return deltas
+
+    def changed_labels(self, since: int) -> set[str] | None:
+        """Concepts whose labels changed between version `since` and this
+        builder's version, or None if the published deltas can't tell."""
+        deltas = self.deltas_between(since, self.version)
+        if deltas is None:
+            return None
+        return {
+            resourceid
+            for delta in deltas
+            for kind, resourceid, _value in delta["changes"]
+            if kind == "labels"
+        }
+
+    @staticmethod
+    def apply_deltas(snapshot: dict, deltas: list[dict]) -> dict:
+        """Return a copy of `snapshot` with `deltas` applied, leaving the
+        original intact for any builder still reading it."""
+        builder = ConceptBuilder(read_cache=False)
+        builder.load_snapshot(snapshot)
+        builder.graph = builder.graph.copy()
+        builder.labels = dict(builder.labels)
+        builder.schemes = dict(builder.schemes)
+        for delta in deltas:
+            builder.apply_changes(delta["changes"])
+            builder.version = delta["version"]
+        return builder.snapshot()
+
+    def load_snapshot(self, snapshot: dict):
+        self.version = snapshot["version"]
+        for attribute in SNAPSHOT_ATTRIBUTES:
+            setattr(self, attribute, snapshot[attribute])
+
+    def snapshot(self) -> dict:
+        snapshot = {"version": self.version}
+        for attribute in SNAPSHOT_ATTRIBUTES:
+            snapshot[attribute] = getattr(self, attribute)
+        return snapshot
+
+    def rebuild_cache(self, *, unless_published=False):
+        """Rebuild the maps from the database and publish them. Holds the
+        snapshot lock throughout, so no edit published meanwhile is lost.
+        With `unless_published`, read instead whatever snapshot another
+        process published while this one waited for the lock."""
+        with snapshot_lock():
+            if unless_published and self.read_from_cache():
+                return
+            # Edits left for a rebuild before this point are read below;
+            # any left later may have been missed, and stay flagged.
+            cache.delete(SNAPSHOT_STALE_KEY)
+            start = time.monotonic()
+            self.graph = ConceptGraph.from_edges(
+                self.top_concepts_map(), self.narrower_concepts_map()
+            )
+            self.labels_map()
+            self.populate_schemes()
+            self.write_to_cache()
+        logger.info(
+            "Rebuilt concept cache: %d concepts in %.2f seconds",
+            len(self.labels),
+            time.monotonic() - start,
+        )
+
+    def write_to_cache(self):
+        """Publish this builder's maps as a new full snapshot, retiring all
+        earlier deltas. Call with the snapshot lock held."""
+        global _local_snapshot
+
+        base = cache.get(SNAPSHOT_BASE_KEY)
+        if base is not None:
+            cache.delete_many(
+                [delta_key(version) for version in base["retired"] + base["deltas"]]
+            )
+        self.version = self.next_version()
+        snapshot = self.snapshot()
+
+        # Publish the snapshot before its version, so that readers seeing
+        # the new version can always find the matching snapshot.
+        cache.set(SNAPSHOT_KEY, snapshot, timeout=None)
+        cache.set(
+            SNAPSHOT_BASE_KEY,
+            {"version": self.version, "deltas": [], "retired": []},
+            timeout=None,
+        )
+        cache.set(SNAPSHOT_VERSION_KEY, self.version, timeout=None)
+        _local_snapshot = snapshot
+
+    @staticmethod
+    def next_version() -> int:
+        """Draw a version from a database sequence: unique across processes
+        and hosts, and still increasing after the cache is cleared."""
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT nextval('arches_lingo__snapshot_version_seq')")
+            return cursor.fetchone()[0]
+
+    @classmethod
+    def update_cache_for_tile(cls, resourceid: str, nodegroup_id: str):
+        """Publish what a single edited or deleted tile changes as a delta
+        on top of the published snapshot.
+
+        Only the entries belonging to `resourceid` are recomputed, and only
+        they are written, so an edit costs a query or two and a small cache
+        write rather than rewriting the snapshot. Publishing holds the
+        snapshot lock, so concurrent edits are chained one after the other
+        rather than lost. If the cache is cold there is nothing to patch:
+        the next read rebuilds it.
+
+        Rather than stall the request behind a rebuild holding the lock,
+        an edit that can't take it soon flags the snapshot as stale: the
+        rebuild may have read the database before the edit committed, so
+        the next read rebuilds again.
+        """
+        with snapshot_lock(wait=False) as locked:
+            if not locked:
+                cache.set(SNAPSHOT_STALE_KEY, True, timeout=None)
+                logger.info(
+                    "Concept cache busy: left resource %s to the next rebuild",
+                    resourceid,
+                )
+                return
+            previous = cls.published_version()
+            base = cache.get(SNAPSHOT_BASE_KEY)
+            if previous is None or base is None:
+                return
+            changes = cls(read_cache=False).changes_for_tile(resourceid, nodegroup_id)
+            if not changes:
+                return
+
+            version = cls.next_version()
+            cache.set(
+                delta_key(version),
+                {"version": version, "previous": previous, "changes": changes},
+                timeout=None,
+            )
+            base["deltas"].append(version)
+            cache.set(SNAPSHOT_BASE_KEY, base, timeout=None)
+            cache.set(SNAPSHOT_VERSION_KEY, version, timeout=None)
+
+            if len(base["deltas"]) >= MAX_DELTAS:
+                cls.compact_cache()
+
+    @classmethod
+    def compact_cache(cls):
+        """Fold the deltas into a new full snapshot at the published
+        version, so processes starting cold apply a short chain. The
+        deltas folded in are kept until the next compaction, for processes
+        still catching up through them. Call with the snapshot lock held."""
+        global _local_snapshot
+
+        builder = cls()
+        base = cache.get(SNAPSHOT_BASE_KEY)
+        if base is None or builder.version == base["version"]:
+            return
+        cache.delete_many([delta_key(version) for version in base["retired"]])
+        snapshot = builder.snapshot()
+        cache.set(SNAPSHOT_KEY, snapshot, timeout=None)
+        cache.set(
+            SNAPSHOT_BASE_KEY,
+            {"version": builder.version, "deltas": [], "retired": base["deltas"]},
+            timeout=None,
+        )
+        _local_snapshot = snapshot
+
+    def changes_for_tile(self, resourceid: str, nodegroup_id: str) -> list[tuple]:
+        """Recompute the entries an edited or deleted tile affects, as
+        (kind, resourceid, value) changes for apply_changes()."""
+        if nodegroup_id == TOP_CONCEPT_OF_NODE_AND_NODEGROUP:
+            return [
+                ("top_concept_of", resourceid, self.top_concept_of_ids(resourceid)),
+                ("labels", resourceid, self.concept_labels(resourceid)),
+            ]
+        if nodegroup_id == CLASSIFICATION_STATUS_NODEGROUP:
+            return [
+                ("broader", resourceid, self.broader_concept_ids(resourceid)),
+                ("labels", resourceid, self.concept_labels(resourceid)),
             ]
+        if nodegroup_id == CONCEPT_NAME_NODEGROUP:
+            return [("labels", resourceid, self.concept_labels(resourceid))]
+        if nodegroup_id == SCHEME_NAME_NODEGROUP:
+            self.populate_schemes()
+            return [("schemes", None, self.schemes)]
+        return []
+
+    def apply_changes(self, changes: list[tuple]):
+        for kind, resourceid, value in changes:
+            if kind == "top_concept_of":
+                self.graph.set_top_concept_of(resourceid, value)
+            elif kind == "broader":
+                self.graph.set_broader_concepts(resourceid, value)
+            elif kind == "labels":
+                self.labels[resourceid] = value
+            elif kind == "schemes":
+                self.schemes = value
+
+    def top_concept_of_ids(self, conceptid: str) -> list[str]:
+        return list(
+            TileModel.objects.filter(
+                resourceinstance_id=conceptid,
+                nodegroup_id=TOP_CONCEPT_OF_NODE_AND_NODEGROUP,
+            )
+            .annotate(top_concept_of=self.resources_from_tiles(TOP_CONCEPT_OF_LOOKUP))
+            .values_list("top_concept_of", flat=True)
+        )
+
+    def broader_concept_ids(self, conceptid: str) -> list[str]:
+        return list(
+            TileModel.objects.filter(
+                resourceinstance_id=conceptid,
+                nodegroup_id=CLASSIFICATION_STATUS_NODEGROUP,
+            )
+            .annotate(broader_concept=self.resources_from_tiles(BROADER_LOOKUP))
+            .values_list("broader_concept", flat=True)
         )
-        try:
-            self.top_concepts = from_cache["top_concepts"]
-            self.narrower_concepts = from_cache["narrower_concepts"]
-            self.schemes = from_cache["schemes"]
-            self.labels = from_cache["labels"]
-            self.broader_concepts = from_cache["broader_concepts"]
-            self.schemes_by_top_concept = from_cache["schemes_by_top_concept"]
-        except KeyError:
-            self.rebuild_cache()
 
-    def rebuild_cache(self):
-        self.top_concepts_map()
-        self.narrower_concepts_map()
-        self.populate_schemes()
+    def concept_labels(self, conceptid: str) -> list[dict]:
+        label_tiles = (
+            self.concept_label_tiles()
+            .filter(resourceinstance_id=conceptid)
+            .values_list("data", flat=True)
+        )
+        return [self.serialize_concept_label(label) for label in label_tiles]
 
-        cache.set("top_concepts", self.top_concepts)
-        cache.set("narrower_concepts", self.narrower_concepts)
-        cache.set("schemes", self.schemes)
-        cache.set("labels", self.labels)
-        # Reverse trees.
-        cache.set("broader_concepts", self.broader_concepts)
-        cache.set("schemes_by_top_concept", self.schemes_by_top_concept)
+    @staticmethod
+    def concept_label_tiles():
+        return (
+            TileModel.objects.filter(nodegroup_id=CONCEPT_NAME_NODEGROUP)
+            .exclude(**{f"data__{CONCEPT_NAME_TYPE_NODE}": None})
+            .exclude(**{f"data__{CONCEPT_NAME_LANGUAGE_NODE}": None})
+        )
 
     @staticmethod
     def resources_from_tiles(lookup_expression: str):
@@ -121,84 +451,188 @@ class ConceptBuilder:
             .values("data")
         )
 
-    def top_concepts_map(self):
-        top_concept_of_tiles = (
+    def top_concepts_map(self) -> list[tuple[str, str]]:
+        """Return (scheme, top concept) edges."""
+        edges = (
             TileModel.objects.filter(nodegroup_id=TOP_CONCEPT_OF_NODE_AND_NODEGROUP)
             .annotate(top_concept_of=self.resources_from_tiles(TOP_CONCEPT_OF_LOOKUP))
-            .annotate(labels=self.labels_subquery(CONCEPT_NAME_NODEGROUP))
-            .values("resourceinstance_id", "top_concept_of", "labels")
-        )
-        for tile in top_concept_of_tiles:
-            scheme_id = tile["top_concept_of"]
-            top_concept_id = str(tile["resourceinstance_id"])
-            self.top_concepts[scheme_id].add(top_concept_id)
-            self.schemes_by_top_concept[top_concept_id].add(scheme_id)
-            self.labels[top_concept_id] = tile["labels"]
-
-    def narrower_concepts_map(self):
-        broader_concept_tiles = (
+            .values_list("top_concept_of", "resourceinstance_id")
+        )
+        return [
+            (scheme_id, str(top_concept_id))
+            for scheme_id, top_concept_id in edges.iterator(chunk_size=CHUNK_SIZE)
+        ]
+
+    def narrower_concepts_map(self) -> list[tuple[str, str]]:
+        """Return (broader, narrower) edges."""
+        edges = (
             TileModel.objects.filter(nodegroup_id=CLASSIFICATION_STATUS_NODEGROUP)
             .annotate(broader_concept=self.resources_from_tiles(BROADER_LOOKUP))
-            .annotate(labels=self.labels_subquery(CONCEPT_NAME_NODEGROUP))
-            .values("resourceinstance_id", "broader_concept", "labels")
+            .values_list("broader_concept", "resourceinstance_id")
         )
-        for tile in broader_concept_tiles.iterator():
-            broader_concept_id = tile["broader_concept"]
-            narrower_concept_id: str = str(tile["resourceinstance_id"])
-            self.narrower_concepts[broader_concept_id].add(narrower_concept_id)
-            self.broader_concepts[narrower_concept_id].add(broader_concept_id)
-            self.labels[narrower_concept_id] = tile["labels"]
+        return [
+            (broader_concept_id, str(narrower_concept_id))
+            for broader_concept_id, narrower_concept_id in edges.iterator(
+                chunk_size=CHUNK_SIZE
+            )
+        ]
 
-    def populate_schemes(self):
-        self.schemes = ResourceInstance.objects.filter(
-            graph_id=SCHEMES_GRAPH_ID
-        ).annotate(labels=self.labels_subquery(SCHEME_NAME_NODEGROUP))
+    def labels_map(self):
+        """Fetch the labels of every concept at once, grouped by concept."""
+        labels_by_concept = (
+            self.concept_label_tiles()
+            .values("resourceinstance_id")
+            .annotate(labels=ArrayAgg("data"))
+            .values_list("resourceinstance_id", "labels")
+        )
+        self.labels = {
+            str(conceptid): [self.serialize_concept_label(label) for label in labels]
+            for conceptid, labels in labels_by_concept.iterator(chunk_size=CHUNK_SIZE)
+        }
 
-    def serialize_scheme(self, scheme: ResourceInstance, *, children=True):
-        scheme_id: str = str(scheme.pk)
-        data = {
-            "id": scheme_id,
-            "labels": [self.serialize_scheme_label(label) for label in scheme.labels],
+    def populate_schemes(self):
+        schemes = (
+            ResourceInstance.objects.filter(graph_id=SCHEMES_GRAPH_ID)
+            .annotate(labels=self.labels_subquery(SCHEME_NAME_NODEGROUP))
+            .values_list("pk", "labels")
+        )
+        self.schemes = {
+            str(scheme_id): [self.serialize_scheme_label(label) for label in labels]
+            for scheme_id, labels in schemes
         }
+
+    def top_concept_ids(self, scheme_id: str) -> list[str]:
+        return self.graph.related(self.graph.top_concepts, scheme_id)
+
+    def narrower_concept_ids(self, conceptid: str) -> list[str]:
+        return self.graph.related(self.graph.narrower, conceptid)
+
+    @staticmethod
+    def child_depth(depth: int | None) -> int | None:
+        return None if depth is None else depth - 1
+
+    def serialize_scheme(
+        self, scheme_id: str, *, children=True, depth: int | None = None
+    ):
+        """Serialize a scheme, and unless `children` is False, its top
+        concepts down to `depth` levels (None: the whole tree)."""
+        data = {"id": scheme_id, "labels": self.display_labels(self.schemes[scheme_id])}
         if children:
-            data["top_concepts"] = [
-                self.serialize_concept(concept_id)
-                for concept_id in self.top_concepts[scheme_id]
-            ]
+            scheme_node = self.graph.index.get(scheme_id)
+            top_nodes = (
+                self.graph.top_concepts[scheme_node] if scheme_node is not None else []
+            )
+            data["top_concept_count"] = len(top_nodes)
+            if depth is None or depth > 0:
+                data["top_concepts"] = [
+                    self.serialize_concept_node(node, depth=self.child_depth(depth))
+                    for node in top_nodes
+                ]
         return data
 
     def serialize_scheme_label(self, label_tile: dict):
         valuetype_id = label_tile[SCHEME_NAME_TYPE_NODE][0]["labels"][0]["value"]
         language_id = label_tile[SCHEME_NAME_LANGUAGE_NODE][0]["labels"][0]["value"]
-        value = label_tile[SCHEME_NAME_CONTENT_NODE] or _("Unknown")
+        value = label_tile[SCHEME_NAME_CONTENT_NODE] or None
         return {
             "valuetype_id": valuetype_id,
             "language_id": language_id,
             "value": value,
         }
 
-    def serialize_concept(self, conceptid: str, *, parents=False, children=True):
+    @staticmethod
+    def display_labels(labels: list[dict]) -> list[dict]:
+        """Labels as served. A missing value is cached as None and shown as
+        "Unknown" in the language of the request serializing it."""
+        if all(label["value"] is not None for label in labels):
+            return labels
+        return [
+            {
+                **label,
+                "value": _("Unknown") if label["value"] is None else label["value"],
+            }
+            for label in labels
+        ]
+
+    def serialize_concepts_batch(self, conceptids: list[str], *, children=False):
+        """Serialize concepts with their parents, serializing each distinct
+        scheme or ancestor once for the whole batch. Results share those
+        parent dicts, so treat them as read-only."""
+        fragments = {}
+        return [
+            self.serialize_concept(
+                conceptid, parents=True, children=children, fragments=fragments
+            )
+            for conceptid in conceptids
+        ]
+
+    def serialize_concept(
+        self,
+        conceptid: str,
+        *,
+        parents=False,
+        children=True,
+        depth: int | None = None,
+        fragments: dict | None = None,
+    ):
+        try:
+            node = self.graph.index[conceptid]
+        except KeyError:
+            # Not (yet) placed in any hierarchy.
+            data = {
+                "id": conceptid,
+                "labels": self.display_labels(self.labels.get(conceptid, [])),
+            }
+            if children:
+                data["narrower_count"] = 0
+                if depth is None or depth > 0:
+                    data["narrower"] = []
+            if parents:
+                data["parents"] = []
+                data["polyhierarchical"] = False
+            return data
+        return self.serialize_concept_node(
+            node, parents=parents, children=children, depth=depth, fragments=fragments
+        )
+
+    def serialize_concept_node(
+        self,
+        node: int,
+        *,
+        parents=False,
+        children=True,
+        depth: int | None = None,
+        fragments: dict | None = None,
+    ):
+        conceptid = self.graph.ids[node]
         data = {
             "id": conceptid,
-            "labels": [
-                self.serialize_concept_label(label) for label in self.labels[conceptid]
-            ],
+            "labels": self.display_labels(self.labels.get(conceptid, [])),
         }
         if children:
-            data["narrower"] = [
-                self.serialize_concept(conceptid)
-                for conceptid in self.narrower_concepts[conceptid]
-            ]
+            narrower_nodes = self.graph.narrower[node]
+            data["narrower_count"] = len(narrower_nodes)
+            if depth is None or depth > 0:
+                data["narrower"] = [
+                    self.serialize_concept_node(
+                        narrower_node, depth=self.child_depth(depth)
+                    )
+                    for narrower_node in narrower_nodes
+                ]
         if parents:
-            path = self.add_broader_concept_recursive([], conceptid)
-            scheme_id, parent_concept_ids = path[0], path[1:]
+            scheme_node, *parent_nodes = self.graph.broader_path(node)
+            parent_concept_ids = [self.graph.ids[parent] for parent in parent_nodes]
             if len(parent_concept_ids) > 1:
                 self.polyhierarchical_concepts.add(conceptid)
-            schemes = [scheme for scheme in self.schemes if str(scheme.pk) == scheme_id]
-            data["parents"] = [self.serialize_scheme(schemes[0], children=False)] + [
-                self.serialize_concept(parent_id, children=False)
-                for parent_id in parent_concept_ids
-            ]
+            if fragments is None:
+                fragments = {}
+            data["parents"] = []
+            scheme_id = self.graph.ids[scheme_node] if scheme_node is not None else None
+            if scheme_id in self.schemes:
+                data["parents"].append(self.parent_fragment(scheme_node, fragments))
+            data["parents"].extend(
+                self.parent_fragment(parent, fragments) for parent in parent_nodes
+            )
 
             self_and_parent_ids = set([conceptid] + parent_concept_ids)
             data["polyhierarchical"] = bool(
@@ -207,26 +641,71 @@ class ConceptBuilder:
 
         return data
 
-    def add_broader_concept_recursive(self, working_parent_list, conceptid):
-        # TODO: sort on sortorder at higher stacklevel once captured in original data.
-        broader_concepts = sorted(self.broader_concepts[conceptid])
+    def parent_fragment(self, node: int, fragments: dict) -> dict:
+        """Serialize a scheme or concept as a parent, memoized in `fragments`."""
         try:
-            first_broader_conceptid = broader_concepts[0]
-        except IndexError:
-            # TODO: sort here too.
-            schemes = sorted(self.schemes_by_top_concept[conceptid])
-            working_parent_list.insert(0, schemes[0])
-            return working_parent_list
+            return fragments[node]
+        except KeyError:
+            pass
+        resourceid = self.graph.ids[node]
+        if resourceid in self.schemes:
+            fragment = self.serialize_scheme(resourceid, children=False)
+        else:
+            fragment = self.serialize_concept_node(node, children=False)
+        fragments[node] = fragment
+        return fragment
 
-        working_parent_list.insert(0, first_broader_conceptid)
-        return self.add_broader_concept_recursive(
-            working_parent_list, first_broader_conceptid
+    def stream_schemes(self, *, depth: int | None = None) -> Iterator[str]:
+        """Yield the serialized tree as JSON fragments, one node at a time,
+        so that neither the tree nor its encoding is held in memory."""
+        yield '{"schemes": ['
+        for i, scheme_id in enumerate(self.schemes):
+            if i:
+                yield ", "
+            yield from self.stream_scheme(scheme_id, depth=depth)
+        yield "]}"
+
+    def stream_scheme(
+        self, scheme_id: str, *, depth: int | None = None
+    ) -> Iterator[str]:
+        data = self.serialize_scheme(scheme_id, children=False)
+        scheme_node = self.graph.index.get(scheme_id)
+        top_nodes = (
+            self.graph.top_concepts[scheme_node] if scheme_node is not None else []
+        )
+        data["top_concept_count"] = len(top_nodes)
+        yield from self.stream_with_children(
+            data, "top_concepts", top_nodes, depth=depth
         )
 
+    def stream_concept_node(
+        self, node: int, *, depth: int | None = None
+    ) -> Iterator[str]:
+        data = self.serialize_concept_node(node, children=False)
+        narrower_nodes = self.graph.narrower[node]
+        data["narrower_count"] = len(narrower_nodes)
+        yield from self.stream_with_children(
+            data, "narrower", narrower_nodes, depth=depth
+        )
+
+    def stream_with_children(
+        self, data: dict, key: str, nodes, *, depth: int | None = None
+    ) -> Iterator[str]:
+        if depth is not None and depth <= 0:
+            yield json.dumps(data)
+            return
+        # Reopen the encoded object to append the children as they stream.
+        yield json.dumps(data)[:-1] + f', "{key}": ['
+        for i, node in enumerate(nodes):
+            if i:
+                yield ", "
+            yield from self.stream_concept_node(node, depth=self.child_depth(depth))
+        yield "]}"
+
     def serialize_concept_label(self, label_tile: dict):
         valuetype_id = label_tile[CONCEPT_NAME_TYPE_NODE][0]["labels"][0]["value"]
         language_id = label_tile[CONCEPT_NAME_LANGUAGE_NODE][0]["labels"][0]["value"]
-        value = label_tile[CONCEPT_NAME_CONTENT_NODE] or _("Unknown")
+        value = label_tile[CONCEPT_NAME_CONTENT_NODE] or None
         return {
             "valuetype_id": valuetype_id,
             "language_id": language_id,
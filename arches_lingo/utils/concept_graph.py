@@ -0,0 +1,226 @@
+from array import array
+from typing import Iterable
+
+
+class Adjacency:
+    """Compressed sparse row (CSR) adjacency lists over interned node ids.
+
+    The targets of node `n` are `targets[offsets[n]:offsets[n + 1]]`.
+    """
+
+    TYPECODE = "i"
+
+    def __init__(self, offsets=None, targets=None):
+        self.offsets = offsets if offsets is not None else array(self.TYPECODE, [0])
+        self.targets = targets if targets is not None else array(self.TYPECODE)
+
+    @classmethod
+    def from_pairs(cls, size: int, pairs: Iterable[tuple[int, int]]):
+        pairs = sorted(set(pairs))
+        counts = [0] * size
+        for source, _target in pairs:
+            counts[source] += 1
+
+        offsets = array(cls.TYPECODE, [0])
+        total = 0
+        for count in counts:
+            total += count
+            offsets.append(total)
+        targets = array(cls.TYPECODE, (target for _source, target in pairs))
+        return cls(offsets, targets)
+
+    def copy(self):
+        return type(self)(
+            array(self.TYPECODE, self.offsets), array(self.TYPECODE, self.targets)
+        )
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, node: int) -> array:
+        return self.targets[self.offsets[node] : self.offsets[node + 1]]
+
+    def grow(self):
+        self.offsets.append(self.offsets[-1])
+
+    def replace(self, node: int, targets: Iterable[int]):
+        targets = array(self.TYPECODE, targets)
+        start, end = self.offsets[node], self.offsets[node + 1]
+        self.targets[start:end] = targets
+        if delta := len(targets) - (end - start):
+            for i in range(node + 1, len(self.offsets)):
+                self.offsets[i] += delta
+
+    def add(self, node: int, target: int):
+        targets = self[node]
+        if target not in targets:
+            targets.append(target)
+            self.replace(node, targets)
+
+    def discard(self, node: int, target: int):
+        targets = self[node]
+        if target in targets:
+            targets.remove(target)
+            self.replace(node, targets)
+
+
+class ConceptGraph:
+    """Scheme and concept hierarchy keyed by dense integers.
+
+    Each resourceid (str) is interned once in `ids`; all adjacency lists
+    hold indexes into `ids` rather than strings or sets.
+    """
+
+    def __init__(self):
+        self.ids: list[str] = []
+        self.index: dict[str, int] = {}
+
+        # key=scheme val=top concepts
+        self.top_concepts = Adjacency()
+        # key=concept val=narrower concepts
+        self.narrower = Adjacency()
+
+        # Reverse (leaf-first) tree
+        # key=concept val=broader concepts
+        self.broader = Adjacency()
+        # key=top concept val=schemes
+        self.schemes_by_top_concept = Adjacency()
+
+        # Memoized links resolved by broader_path(), kept until the graph
+        # changes. key=concept val=(scheme, parent concept or None at the top)
+        self.path_links: dict[int, tuple[int | None, int | None]] = {}
+
+    def __getstate__(self):
+        # The index is cheaper to rebuild than to pickle, and path links
+        # are only memoized on demand.
+        state = vars(self).copy()
+        del state["index"]
+        del state["path_links"]
+        return state
+
+    def __setstate__(self, state):
+        vars(self).update(state)
+        self.index = {resourceid: node for node, resourceid in enumerate(self.ids)}
+        self.path_links = {}
+
+    def copy(self):
+        """Return a copy that can be patched without affecting this graph."""
+        graph = type(self)()
+        graph.ids = list(self.ids)
+        graph.index = dict(self.index)
+        graph.top_concepts = self.top_concepts.copy()
+        graph.narrower = self.narrower.copy()
+        graph.broader = self.broader.copy()
+        graph.schemes_by_top_concept = self.schemes_by_top_concept.copy()
+        return graph
+
+    @classmethod
+    def from_edges(
+        cls,
+        top_concept_edges: Iterable[tuple[str, str]],
+        broader_edges: Iterable[tuple[str, str]],
+    ):
+        """Build a graph from (scheme, top concept) and (broader, narrower)
+        pairs of resourceids."""
+        graph = cls()
+        top = [(graph.intern(s), graph.intern(c)) for s, c in top_concept_edges]
+        broader = [(graph.intern(b), graph.intern(n)) for b, n in broader_edges]
+
+        size = len(graph.ids)
+        graph.top_concepts = Adjacency.from_pairs(size, top)
+        graph.schemes_by_top_concept = Adjacency.from_pairs(
+            size, [(c, s) for s, c in top]
+        )
+        graph.narrower = Adjacency.from_pairs(size, broader)
+        graph.broader = Adjacency.from_pairs(size, [(n, b) for b, n in broader])
+        return graph
+
+    def adjacencies(self):
+        return (
+            self.top_concepts,
+            self.narrower,
+            self.broader,
+            self.schemes_by_top_concept,
+        )
+
+    def intern(self, resourceid: str) -> int:
+        try:
+            return self.index[resourceid]
+        except KeyError:
+            pass
+        node = len(self.ids)
+        self.ids.append(resourceid)
+        self.index[resourceid] = node
+        for adjacency in self.adjacencies():
+            adjacency.grow()
+        return node
+
+    def related(self, adjacency: Adjacency, resourceid: str) -> list[str]:
+        try:
+            node = self.index[resourceid]
+        except KeyError:
+            return []
+        return [self.ids[target] for target in adjacency[node]]
+
+    def broader_path(self, node: int) -> tuple[int | None, ...]:
+        """Return (scheme, top concept, ..., parent) for a concept node.
+
+        At each level the first broader concept (by resourceid) is followed.
+        The scheme is None if the path never reaches one, e.g. because of a
+        cycle. Each concept's link to its parent is resolved once, so the
+        path of any concept sharing ancestry with a resolved one costs
+        O(depth) to read back.
+        """
+        self.resolve_path_links(node)
+        scheme, parent = self.path_links[node]
+        parents = []
+        while parent is not None:
+            parents.append(parent)
+            parent = self.path_links[parent][1]
+        parents.reverse()
+        return (scheme, *parents)
+
+    def resolve_path_links(self, node: int):
+        # TODO: sort on sortorder once captured in original data.
+        unresolved = []
+        seen = set()
+        current = node
+        while current not in self.path_links:
+            if current in seen:
+                # Cycle: cut it at the last concept reached.
+                self.path_links[unresolved.pop()] = (None, None)
+                break
+            seen.add(current)
+            broader_nodes = self.broader[current]
+            if not broader_nodes:
+                schemes = self.schemes_by_top_concept[current]
+                scheme = min(schemes, key=self.ids.__getitem__) if schemes else None
+                self.path_links[current] = (scheme, None)
+                break
+            unresolved.append(current)
+            current = min(broader_nodes, key=self.ids.__getitem__)
+
+        # Link the unresolved concepts from the top down.
+        for concept in reversed(unresolved):
+            parent = min(self.broader[concept], key=self.ids.__getitem__)
+            self.path_links[concept] = (self.path_links[parent][0], parent)
+
+    def set_top_concept_of(self, conceptid: str, scheme_ids: Iterable[str]):
+        self.path_links.clear()
+        node = self.intern(conceptid)
+        for scheme in self.schemes_by_top_concept[node]:
+            self.top_concepts.discard(scheme, node)
+        schemes = sorted({self.intern(scheme_id) for scheme_id in scheme_ids})
+        self.schemes_by_top_concept.replace(node, schemes)
+        for scheme in schemes:
+            self.top_concepts.add(scheme, node)
+
+    def set_broader_concepts(self, conceptid: str, broader_ids: Iterable[str]):
+        self.path_links.clear()
+        node = self.intern(conceptid)
+        for broader in self.broader[node]:
+            self.narrower.discard(broader, node)
+        broader_nodes = sorted({self.intern(broader_id) for broader_id in broader_ids})
+        self.broader.replace(node, broader_nodes)
+        for broader in broader_nodes:
+            self.narrower.add(broader, node)
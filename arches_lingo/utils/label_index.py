@@ -0,0 +1,420 @@
+from bisect import bisect_left, bisect_right, insort
+from itertools import accumulate
+from threading import Lock, Thread
+
+from django.utils.translation import gettext as _
+
+from arches.app.models.system_settings import settings
+
+# This process's label indexes, refreshed when a newer snapshot is read.
+_prefix_index = None
+_prefix_index_lock = Lock()
+_fuzzy_index = None
+_fuzzy_index_lock = Lock()
+_fuzzy_index_building = False
+
+
+def levenshtein(a: str, b: str, max_distance: int | None = None) -> int:
+    """Edit distance between `a` and `b`. With `max_distance`, stop early
+    and return max_distance + 1 once the distance must exceed it."""
+    if max_distance is not None and abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    # A shared prefix or suffix never adds to the distance.
+    while a and b and a[0] == b[0]:
+        a, b = a[1:], b[1:]
+    while a and b and a[-1] == b[-1]:
+        a, b = a[:-1], b[:-1]
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(
+                min(
+                    previous[j] + 1,
+                    current[j - 1] + 1,
+                    previous[j - 1] + (char_a != char_b),
+                )
+            )
+        if max_distance is not None and min(current) > max_distance:
+            return max_distance + 1
+        previous = current
+    if max_distance is not None:
+        return min(previous[-1], max_distance + 1)
+    return previous[-1]
+
+
+class SymSpell:
+    """Symmetric delete index of strings under edit distance (SymSpell).
+
+    Each value is filed under every string reached by deleting up to
+    `max_distance` characters from its first `prefix_length` characters.
+    Two values within the distance share such a delete, so a search only
+    verifies the values filed under the term's own deletes.
+
+    Most deletes belong to a single value, which is filed as is; others
+    file a tuple of values. Either is replaced rather than mutated, so
+    searches may read the index while values are added or removed.
+    """
+
+    def __init__(self, values=(), *, max_distance=2, prefix_length=5):
+        self.max_distance = max_distance
+        self.prefix_length = prefix_length
+        # key=delete val=value, or tuple of values
+        self.postings: dict[str, str | tuple[str, ...]] = {}
+        shared = {}
+        for value in values:
+            for delete in self.deletes(value, max_distance):
+                filed = self.postings.setdefault(delete, value)
+                if filed is not value:
+                    shared.setdefault(delete, [filed]).append(value)
+        for delete, filed in shared.items():
+            self.postings[delete] = tuple(filed)
+
+    def deletes(self, value: str, max_distance: int) -> set[str]:
+        prefix = value[: self.prefix_length]
+        deletes = {prefix}
+        edge = deletes
+        for _ in range(max_distance):
+            edge = {
+                delete[:i] + delete[i + 1 :]
+                for delete in edge
+                for i in range(len(delete))
+            }
+            deletes |= edge
+        return deletes
+
+    def filed(self, delete: str) -> tuple[str, ...]:
+        filed = self.postings.get(delete, ())
+        return (filed,) if isinstance(filed, str) else filed
+
+    def add(self, value: str):
+        for delete in self.deletes(value, self.max_distance):
+            filed = self.filed(delete)
+            self.postings[delete] = filed + (value,) if filed else value
+
+    def remove(self, value: str):
+        for delete in self.deletes(value, self.max_distance):
+            remaining = tuple(filed for filed in self.filed(delete) if filed != value)
+            if len(remaining) > 1:
+                self.postings[delete] = remaining
+            elif remaining:
+                self.postings[delete] = remaining[0]
+            else:
+                self.postings.pop(delete, None)
+
+    def search(self, term: str, max_distance: int) -> list[tuple[str, int]]:
+        """Return (value, distance) for every value within `max_distance`,
+        which may not exceed the index's own."""
+        if max_distance > self.max_distance:
+            raise ValueError(max_distance)
+        candidates = set()
+        for delete in self.deletes(term, max_distance):
+            candidates.update(self.filed(delete))
+        results = []
+        length = len(term)
+        for value in candidates:
+            if abs(len(value) - length) > max_distance:
+                continue
+            distance = levenshtein(term, value, max_distance)
+            if distance <= max_distance:
+                results.append((value, distance))
+        return results
+
+
+class PrefixLabelIndex:
+    """Concept labels as (casefolded value, value, language, conceptid) rows
+    sorted for prefix lookups by binary search. Each language gets its own
+    sorted list, as does the union of all languages (key None). When a
+    newer snapshot is read, only the concepts whose labels changed are
+    patched in."""
+
+    def __init__(self, labels: dict[str, list[dict]], *, version=None):
+        self.version = version
+        self.lock = Lock()
+        # key=conceptid val=set of rows
+        self.rows_by_concept: dict[str, set[tuple]] = {}
+        # key=language (None: all) val=sorted rows
+        self.rows: dict[str | None, list[tuple]] = {None: []}
+        for conceptid, concept_labels in labels.items():
+            if rows := self.label_rows(conceptid, concept_labels):
+                self.rows_by_concept[conceptid] = rows
+            for row in rows:
+                for language in (None, row[2]):
+                    self.rows.setdefault(language, []).append(row)
+        for rows in self.rows.values():
+            rows.sort()
+
+    @staticmethod
+    def label_rows(conceptid: str, labels: list[dict]) -> set[tuple]:
+        return {
+            (label["value"].casefold(), label["value"], label["language_id"], conceptid)
+            for label in labels
+            if label["value"]
+        }
+
+    @classmethod
+    def for_builder(cls, builder):
+        """Return this process's index, brought up to date with the
+        builder's snapshot version: patched if the published deltas tell
+        which concepts changed, rebuilt otherwise."""
+        global _prefix_index
+
+        with _prefix_index_lock:
+            index = _prefix_index
+            changed = None
+            if index is not None and None not in (index.version, builder.version):
+                if index.version == builder.version:
+                    return index
+                changed = builder.changed_labels(index.version)
+            if changed is None:
+                _prefix_index = cls(builder.labels, version=builder.version)
+            else:
+                index.patch(builder.labels, changed, version=builder.version)
+            return _prefix_index
+
+    def patch(self, labels: dict[str, list[dict]], conceptids, *, version=None):
+        with self.lock:
+            for conceptid in conceptids:
+                previous = self.rows_by_concept.pop(conceptid, set())
+                current = self.label_rows(conceptid, labels.get(conceptid, []))
+                for row in previous - current:
+                    for language in (None, row[2]):
+                        rows = self.rows[language]
+                        i = bisect_left(rows, row)
+                        if i < len(rows) and rows[i] == row:
+                            del rows[i]
+                for row in current - previous:
+                    for language in (None, row[2]):
+                        insort(self.rows.setdefault(language, []), row)
+                if current:
+                    self.rows_by_concept[conceptid] = current
+            self.version = version
+
+    def search(self, prefix: str, *, language: str | None = None, limit=10):
+        """Return up to `limit` labels starting with `prefix`, at most one
+        per concept, in alphabetical order."""
+        prefix = prefix.casefold()
+
+        results = []
+        seen = set()
+        with self.lock:
+            rows = self.rows.get(language, [])
+            for i in range(bisect_left(rows, (prefix,)), len(rows)):
+                folded, value, language_id, conceptid = rows[i]
+                if len(results) >= limit or not folded.startswith(prefix):
+                    break
+                if conceptid in seen:
+                    continue
+                seen.add(conceptid)
+                results.append(
+                    {"id": conceptid, "value": value, "language_id": language_id}
+                )
+        return results
+
+
+class FuzzyLabelIndex:
+    """In-memory counterpart of LabelValueQuerySet.fuzzy_search.
+
+    Label values are held in a SymSpell index for edit distance lookups up
+    to LINGO_SEARCH_MEMORY_MAX_EDIT_DISTANCE, and their casefolded forms
+    are joined into one text for substring matches. Searches at larger
+    distances are left to the database. The first build runs in a background thread, as does any
+    rebuild needed because the published deltas can't tell which labels
+    changed. Otherwise only the concepts whose labels changed are applied.
+
+    Updates hold the index's lock. Searches only take it to read the
+    current structures, and match outside it: updates replace, rather than
+    mutate, anything a search iterates over.
+    """
+
+    def __init__(self, labels: dict[str, list[dict]] | None = None, *, version=None):
+        self.version = version
+        self.lock = Lock()
+        self.max_edit_distance = getattr(
+            settings, "LINGO_SEARCH_MEMORY_MAX_EDIT_DISTANCE", 2
+        )
+        # key=conceptid val=frozenset of label values
+        self.values_by_concept: dict[str, frozenset[str]] = {}
+        concepts_by_value = {}
+        for conceptid, concept_labels in (labels or {}).items():
+            if values := self.label_values(concept_labels):
+                self.values_by_concept[conceptid] = values
+            for value in values:
+                concepts_by_value.setdefault(value, set()).add(conceptid)
+        # key=label value val=frozenset of conceptids
+        self.concepts_by_value: dict[str, frozenset[str]] = {
+            value: frozenset(conceptids)
+            for value, conceptids in concepts_by_value.items()
+        }
+        # key=label value val=casefolded value
+        self.folded_values: dict[str, str] = {
+            value: value.casefold() for value in concepts_by_value
+        }
+        self.folded_text = self.join_folded_values()
+        self.symspell = SymSpell(
+            self.concepts_by_value, max_distance=self.max_edit_distance
+        )
+
+    @staticmethod
+    def label_values(labels: list[dict]) -> frozenset[str]:
+        return frozenset(label["value"] for label in labels if label["value"])
+
+    @classmethod
+    def for_builder(cls, builder):
+        """Return this process's index brought up to date with the
+        builder's snapshot version, or None while it is being built."""
+        with _fuzzy_index_lock:
+            index = _fuzzy_index
+            if index is not None and None not in (index.version, builder.version):
+                if index.version == builder.version:
+                    return index
+                changed = builder.changed_labels(index.version)
+                if changed is not None:
+                    index.patch(builder.labels, changed, version=builder.version)
+                    return index
+        cls.build_in_background(builder)
+        return None
+
+    @classmethod
+    def build_in_background(cls, builder):
+        global _fuzzy_index_building
+
+        with _fuzzy_index_lock:
+            if _fuzzy_index_building:
+                return
+            _fuzzy_index_building = True
+        Thread(
+            target=cls.build, args=(builder,), name="lingo-fuzzy-index", daemon=True
+        ).start()
+
+    @classmethod
+    def build(cls, builder):
+        """Index the builder's labels, and make that this process's index
+        unless a newer one was installed meanwhile."""
+        global _fuzzy_index, _fuzzy_index_building
+
+        try:
+            index = cls(builder.labels, version=builder.version)
+            with _fuzzy_index_lock:
+                if (
+                    _fuzzy_index is None
+                    or _fuzzy_index.version is None
+                    or (index.version or 0) >= _fuzzy_index.version
+                ):
+                    _fuzzy_index = index
+            return index
+        finally:
+            with _fuzzy_index_lock:
+                _fuzzy_index_building = False
+
+    def patch(self, labels: dict[str, list[dict]], conceptids, *, version=None):
+        with self.lock:
+            changed = False
+            for conceptid in conceptids:
+                changed |= self.set_values(
+                    conceptid, self.label_values(labels.get(conceptid, []))
+                )
+            if changed:
+                self.folded_text = self.join_folded_values()
+            self.version = version
+
+    def join_folded_values(self) -> tuple[str, list[int], list[str]]:
+        """The casefolded values separated by NULs (which labels, stored in
+        Postgres, can't contain), where each starts, and the values, so
+        that substring matches are found by str.find()."""
+        folded = self.folded_values.values()
+        text = "\0".join(folded)
+        # Each value starts one past the end of the one before.
+        starts = list(accumulate(map((1).__add__, map(len, folded)), initial=0))
+        return text, starts[:-1], list(self.folded_values)
+
+    def set_values(self, conceptid: str, values: frozenset[str]) -> bool:
+        """Set a concept's label values; return whether any value was added
+        to or removed from the index."""
+        previous = self.values_by_concept.get(conceptid, frozenset())
+        if values == previous:
+            return False
+        changed = False
+        for value in previous - values:
+            if concepts := self.concepts_by_value[value] - {conceptid}:
+                self.concepts_by_value[value] = concepts
+            else:
+                del self.concepts_by_value[value]
+                del self.folded_values[value]
+                self.symspell.remove(value)
+                changed = True
+        for value in values - previous:
+            if value in self.concepts_by_value:
+                self.concepts_by_value[value] |= {conceptid}
+            else:
+                self.concepts_by_value[value] = frozenset([conceptid])
+                self.folded_values[value] = value.casefold()
+                self.symspell.add(value)
+                changed = True
+        if values:
+            self.values_by_concept[conceptid] = values
+        else:
+            self.values_by_concept.pop(conceptid, None)
+        return changed
+
+    def covers(self, max_edit_distance) -> bool:
+        """Whether searches at this edit distance can run in memory."""
+        return (
+            0 <= self.parse_edit_distance(max_edit_distance) <= self.max_edit_distance
+        )
+
+    @staticmethod
+    def parse_edit_distance(max_edit_distance) -> int:
+        try:
+            return int(max_edit_distance)
+        except ValueError:
+            raise ValueError(_("Edit distance could not be converted to an integer."))
+
+    def search(self, term: str, max_edit_distance) -> list[tuple[int, int, str]]:
+        """Return (rank, edit_distance, conceptid) rows ranked as in
+        LabelValueQuerySet.ranked_concepts. Unlike the database, terms of
+        any length can be searched."""
+        if not self.covers(max_edit_distance):
+            raise ValueError(
+                _("Edit distance must be between 0 and {max}.").format(
+                    max=self.max_edit_distance
+                )
+            )
+        max_edit_distance = int(max_edit_distance)
+
+        with self.lock:
+            text, starts, values = self.folded_text
+            concepts_by_value = self.concepts_by_value
+            symspell = self.symspell
+
+        folded_term = term.casefold()
+        # key=conceptid val=[rank, edit distance]
+        best: dict[str, list[int]] = {}
+
+        def match(value, rank, edit_distance):
+            for conceptid in concepts_by_value.get(value, ()):
+                scores = best.setdefault(conceptid, [rank, edit_distance])
+                scores[0] = min(scores[0], rank)
+                scores[1] = min(scores[1], edit_distance)
+
+        position = -1
+        if folded_term and "\0" not in folded_term:
+            position = text.find(folded_term)
+        while position != -1:
+            i = bisect_right(starts, position) - 1
+            end = starts[i + 1] - 1 if i + 1 < len(starts) else len(text)
+            # The first occurrence in a value ranks it.
+            if position > starts[i]:
+                match(values[i], 2, 0)
+            elif position + len(folded_term) == end:
+                match(values[i], 0, 0)
+            else:
+                match(values[i], 1, 0)
+            position = text.find(folded_term, end + 1)
+        for value, edit_distance in symspell.search(term, max_edit_distance):
+            match(value, 3, edit_distance)
+
+        return sorted(
+            (rank, edit_distance, conceptid)
+            for conceptid, (rank, edit_distance) in best.items()
+        )
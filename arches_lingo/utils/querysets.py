@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models.functions import Length
 from django.utils.translation import gettext as _
 
 from arches_lingo.utils.query_expressions import LevenshteinLessEqual
@@ -7,26 +8,61 @@ from arches_lingo.utils.query_expressions import LevenshteinLessEqual
 class LabelValueQuerySet(models.QuerySet):
 
     def fuzzy_search(self, term, max_edit_distance):
-        from arches_lingo.models import VwLabelValue
-
+        """Concepts with a label containing the term or within the edit
+        distance of it, best match per concept first (see ranked_concepts)."""
         if len(term) > 255:
             raise ValueError(_("Fuzzy search terms cannot exceed 255 characters."))
         try:
-            int(max_edit_distance)
+            max_edit_distance = int(max_edit_distance)
         except ValueError:
             raise ValueError(_("Edit distance could not be converted to an integer."))
 
-        fuzzy_matches = VwLabelValue.objects.annotate(
-            edit_distance=LevenshteinLessEqual(
-                models.F("value"),
-                models.Value(term),
-                models.Value(max_edit_distance),
-                output_field=models.IntegerField(),
+        substring_match = models.Q(value__icontains=term)
+        matches = (
+            self.annotate(value_length=Length("value"))
+            # Cheap, indexed prefilter: lengths can't differ by more than
+            # the edit distance.
+            .filter(
+                substring_match
+                | models.Q(
+                    value_length__gte=len(term) - max_edit_distance,
+                    value_length__lte=len(term) + max_edit_distance,
+                )
+            )
+            .annotate(
+                label_distance=models.Case(
+                    models.When(substring_match, then=models.Value(0)),
+                    default=LevenshteinLessEqual(
+                        models.F("value"),
+                        models.Value(term),
+                        models.Value(max_edit_distance),
+                    ),
+                    output_field=models.IntegerField(),
+                ),
+                label_rank=models.Case(
+                    models.When(value__iexact=term, then=models.Value(0)),
+                    models.When(value__istartswith=term, then=models.Value(1)),
+                    models.When(substring_match, then=models.Value(2)),
+                    default=models.Value(3),
+                    output_field=models.IntegerField(),
+                ),
             )
-        ).filter(edit_distance__lte=max_edit_distance)
-        substring_matches = VwLabelValue.objects.filter(value__icontains=term).annotate(
-            edit_distance=models.Value(0)
+            .filter(label_distance__lte=max_edit_distance)
+        )
+
+        return matches.ranked_concepts(
+            rank="label_rank", edit_distance="label_distance"
         )
-        matches = substring_matches | fuzzy_matches
 
-        return matches.order_by("edit_distance", "concept_id")
+    def ranked_concepts(self, rank=models.Value(0), edit_distance=models.Value(0)):
+        """One row per concept: its best (lowest) rank and edit distance over
+        all matching labels, ordered by rank (exact, prefix, substring, fuzzy),
+        edit distance, concept_id."""
+        return (
+            self.values("concept_id")
+            .annotate(
+                rank=models.Min(rank),
+                edit_distance=models.Min(edit_distance),
+            )
+            .order_by("rank", "edit_distance", "concept_id")
+        )
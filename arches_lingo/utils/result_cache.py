@@ -0,0 +1,48 @@
+from collections import OrderedDict
+from threading import Lock
+
+
+class ResultCache:
+    """Bounded, least-recently-used, per-process cache with hit and miss
+    counters. Keys should carry whatever version stamp invalidates them."""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.results = OrderedDict()
+        self.lock = Lock()
+
+    def get(self, key):
+        with self.lock:
+            try:
+                result = self.results[key]
+            except KeyError:
+                self.misses += 1
+                return None
+            self.results.move_to_end(key)
+            self.hits += 1
+            return result
+
+    def set(self, key, result):
+        if self.maxsize <= 0:
+            return
+        with self.lock:
+            self.results[key] = result
+            self.results.move_to_end(key)
+            while len(self.results) > self.maxsize:
+                self.results.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.results.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def info(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": len(self.results),
+            "maxsize": self.maxsize,
+        }
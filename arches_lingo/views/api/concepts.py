@@ -1,8 +1,12 @@
+from bisect import bisect_right
 from http import HTTPStatus
+import uuid
 
 from django.core.paginator import Paginator
+from django.db.models import Q
+from django.http import HttpResponse, StreamingHttpResponse
 from django.utils.decorators import method_decorator
-from django.utils.translation import gettext as _
+from django.utils.translation import get_language, gettext as _
 from django.views.generic import View
 
 from arches.app.models.system_settings import settings
@@ -11,6 +15,8 @@ from arches.app.utils.response import JSONErrorResponse, JSONResponse
 
 from arches_lingo.models import VwLabelValue
 from arches_lingo.utils.concept_builder import ConceptBuilder
+from arches_lingo.utils.label_index import FuzzyLabelIndex, PrefixLabelIndex
+from arches_lingo.utils.result_cache import ResultCache
 
 
 @method_decorator(
@@ -18,18 +24,193 @@ from arches_lingo.utils.concept_builder import ConceptBuilder
 )
 class ConceptTreeView(View):
     def get(self, request):
+        """Serialize the whole tree, or a slice of it:
+        - scheme: only this scheme
+        - parent: only the narrower concepts of this concept
+        - depth: levels of nesting to include below the returned nodes
+        - items, cursor: page through the returned nodes
+        - stream: stream the (whole or depth-limited) tree as it is encoded
+        """
+        try:
+            depth = self.get_non_negative_int(request, "depth")
+            items = self.get_non_negative_int(request, "items")
+            stream = self.get_bool(request, "stream")
+        except ValueError as ve:
+            return JSONErrorResponse(
+                title=_("Unable to retrieve concept tree."),
+                message=ve.args[0],
+                status=HTTPStatus.BAD_REQUEST,
+            )
+        scheme_id = request.GET.get("scheme")
+        parent_id = request.GET.get("parent")
+        cursor = request.GET.get("cursor")
+
         builder = ConceptBuilder()
-        data = {
-            "schemes": [builder.serialize_scheme(scheme) for scheme in builder.schemes]
-        }
+        if stream:
+            return StreamingHttpResponse(
+                self.buffer(builder.stream_schemes(depth=depth)),
+                content_type="application/json",
+            )
+        if parent_id:
+            if parent_id not in builder.graph.index and parent_id not in builder.labels:
+                return JSONErrorResponse(
+                    title=_("Unable to retrieve concept tree."),
+                    message=_("Concept not found."),
+                    status=HTTPStatus.NOT_FOUND,
+                )
+            concept_ids, next_cursor = self.paginate(
+                builder.narrower_concept_ids(parent_id), cursor, items
+            )
+            data = {
+                "parent": parent_id,
+                "narrower": [
+                    builder.serialize_concept(concept_id, depth=depth)
+                    for concept_id in concept_ids
+                ],
+            }
+        elif scheme_id:
+            if scheme_id not in builder.schemes:
+                return JSONErrorResponse(
+                    title=_("Unable to retrieve concept tree."),
+                    message=_("Scheme not found."),
+                    status=HTTPStatus.NOT_FOUND,
+                )
+            all_top_concept_ids = builder.top_concept_ids(scheme_id)
+            concept_ids, next_cursor = self.paginate(all_top_concept_ids, cursor, items)
+            scheme_data = builder.serialize_scheme(scheme_id, children=False)
+            scheme_data["top_concept_count"] = len(all_top_concept_ids)
+            if depth is None or depth > 0:
+                scheme_data["top_concepts"] = [
+                    builder.serialize_concept(
+                        concept_id, depth=builder.child_depth(depth)
+                    )
+                    for concept_id in concept_ids
+                ]
+            data = {"schemes": [scheme_data]}
+        else:
+            scheme_ids, next_cursor = self.paginate(builder.schemes, cursor, items)
+            data = {
+                "schemes": [
+                    builder.serialize_scheme(scheme_id, depth=depth)
+                    for scheme_id in scheme_ids
+                ]
+            }
+
+        data["next_cursor"] = next_cursor
         return JSONResponse(data)
 
+    @staticmethod
+    def buffer(fragments, size=64 * 1024):
+        """Join small fragments into chunks of roughly `size` characters."""
+        chunk = []
+        chunk_length = 0
+        for fragment in fragments:
+            chunk.append(fragment)
+            chunk_length += len(fragment)
+            if chunk_length >= size:
+                yield "".join(chunk)
+                chunk = []
+                chunk_length = 0
+        if chunk:
+            yield "".join(chunk)
+
+    @staticmethod
+    def get_non_negative_int(request, param):
+        value = request.GET.get(param)
+        if value is None:
+            return None
+        try:
+            value = int(value)
+        except ValueError:
+            value = -1
+        if value < 0:
+            raise ValueError(
+                _("{param} must be a non-negative integer.").format(param=param)
+            )
+        return value
+
+    @staticmethod
+    def get_bool(request, param):
+        value = request.GET.get(param)
+        if value is None or value.lower() in ("", "false", "0"):
+            return False
+        if value.lower() in ("true", "1"):
+            return True
+        raise ValueError(_("{param} must be true or false.").format(param=param))
+
+    @staticmethod
+    def paginate(resourceids, cursor, items):
+        """Return up to `items` resourceids sorting after `cursor`, and the
+        cursor for the next page (None if this is the last page)."""
+        if not items:
+            return list(resourceids), None
+        ordered = sorted(resourceids)
+        start = bisect_right(ordered, cursor) if cursor else 0
+        page = ordered[start : start + items]
+        next_cursor = page[-1] if start + items < len(ordered) else None
+        return page, next_cursor
+
 
 @method_decorator(
     group_required("RDM Administrator", raise_exception=True), name="dispatch"
 )
 class ValueSearchView(ConceptTreeView):
+    # Shared by requests in this process; keys carry the snapshot version,
+    # so any edit to a concept or scheme retires earlier results.
+    result_cache = ResultCache(
+        maxsize=getattr(settings, "LINGO_SEARCH_RESULT_CACHE_SIZE", 256)
+    )
+
     def get(self, request):
+        """Serve repeated searches from the result cache."""
+        version = ConceptBuilder.published_version()
+        if version is None:
+            # Cold cache: publish a snapshot to stamp the results with.
+            version = ConceptBuilder().version
+
+        try:
+            key = self.result_cache_key(request, version)
+        except ValueError as ve:
+            return JSONErrorResponse(
+                title=_("Unable to perform search."),
+                message=ve.args[0],
+                status=HTTPStatus.BAD_REQUEST,
+            )
+        if (cached := self.result_cache.get(key)) is not None:
+            content, content_type = cached
+            response = HttpResponse(content, content_type=content_type)
+            status = "hit"
+        else:
+            response = self.search(request)
+            if response.status_code == HTTPStatus.OK:
+                self.result_cache.set(key, (response.content, response["Content-Type"]))
+            status = "miss"
+        response["X-Lingo-Search-Cache"] = (
+            f"{status}; hits={self.result_cache.hits}; "
+            f"misses={self.result_cache.misses}"
+        )
+        return response
+
+    def result_cache_key(self, request, version):
+        # Placeholder labels are translated per request, so responses are
+        # cached per language.
+        return (
+            version,
+            get_language(),
+            self.search_backend(),
+            request.GET.get("term"),
+            str(request.GET.get("maxEditDistance", self.default_sensitivity())),
+            bool(request.GET.get("exact", False)),
+            str(request.GET.get("page", 1)),
+            str(request.GET.get("items", 25)),
+            request.GET.get("cursor"),
+            self.get_bool(request, "count"),
+        )
+
+    def search(self, request):
+        """Search concepts by label. Pass `cursor` (empty for the first page)
+        to page by keyset instead of by page number; `count=true` then adds
+        a total, capped at LINGO_SEARCH_COUNT_CAP."""
         term = request.GET.get("term")
         max_edit_distance = request.GET.get(
             "maxEditDistance", self.default_sensitivity()
@@ -39,38 +220,54 @@ class ValueSearchView(ConceptTreeView):
         items_per_page = request.GET.get("items", 25)
 
         if exact:
-            concept_query = VwLabelValue.objects.filter(value=term).order_by(
-                "concept_id"
-            )
+            concept_query = VwLabelValue.objects.filter(value=term).ranked_concepts()
         elif term:
             try:
-                concept_query = VwLabelValue.objects.fuzzy_search(
-                    term, max_edit_distance
+                if (
+                    self.search_backend() == "memory"
+                    and (index := FuzzyLabelIndex.for_builder(ConceptBuilder()))
+                    and index.covers(max_edit_distance)
+                ):
+                    concept_query = index.search(term, max_edit_distance)
+                else:
+                    concept_query = VwLabelValue.objects.fuzzy_search(
+                        term, max_edit_distance
+                    )
+            except ValueError as ve:
+                return JSONErrorResponse(
+                    title=_("Unable to perform search."),
+                    message=ve.args[0],
+                    status=HTTPStatus.BAD_REQUEST,
                 )
+        else:
+            concept_query = VwLabelValue.objects.ranked_concepts()
+
+        if "cursor" in request.GET:
+            try:
+                return self.get_keyset_page(request, concept_query)
             except ValueError as ve:
                 return JSONErrorResponse(
                     title=_("Unable to perform search."),
                     message=ve.args[0],
                     status=HTTPStatus.BAD_REQUEST,
                 )
+
+        if isinstance(concept_query, list):
+            concept_ids = [concept_id for _rank, _distance, concept_id in concept_query]
         else:
-            concept_query = VwLabelValue.objects.all().order_by("concept_id")
-        concept_ids = concept_query.values_list("concept_id", flat=True).distinct()
+            concept_ids = concept_query.values_list("concept_id", flat=True)
 
         data = []
         paginator = Paginator(concept_ids, items_per_page)
+        page = paginator.get_page(page_number)
         if paginator.count:
-            builder = ConceptBuilder()
-            data = [
-                builder.serialize_concept(
-                    str(concept_uuid), parents=True, children=False
-                )
-                for concept_uuid in paginator.get_page(page_number)
-            ]
+            data = ConceptBuilder().serialize_concepts_batch(
+                [str(concept_uuid) for concept_uuid in page]
+            )
 
         return JSONResponse(
             {
-                "current_page": paginator.get_page(page_number).number,
+                "current_page": page.number,
                 "total_pages": paginator.num_pages,
                 "results_per_page": paginator.per_page,
                 "total_results": paginator.count,
@@ -78,6 +275,82 @@ class ValueSearchView(ConceptTreeView):
             }
         )
 
+    def get_keyset_page(self, request, concept_query):
+        """Fetch the page after the cursor by seeking on the sort key, so
+        every page costs the same, and only count when asked to."""
+        items = self.get_non_negative_int(request, "items") or 25
+        cursor = request.GET.get("cursor")
+
+        if isinstance(concept_query, list):
+            # Rows ranked in memory are already sorted on the keyset.
+            rows = concept_query
+            start = 0
+            if cursor:
+                rank, edit_distance, concept_id = self.decode_cursor(cursor)
+                start = bisect_right(rows, (rank, edit_distance, str(concept_id)))
+            page_rows = rows[start : start + items + 1]
+        else:
+            rows = concept_query.values_list("rank", "edit_distance", "concept_id")
+            page_rows = rows
+            if cursor:
+                rank, edit_distance, concept_id = self.decode_cursor(cursor)
+                page_rows = rows.filter(
+                    Q(rank__gt=rank)
+                    | Q(rank=rank, edit_distance__gt=edit_distance)
+                    | Q(
+                        rank=rank,
+                        edit_distance=edit_distance,
+                        concept_id__gt=concept_id,
+                    )
+                )
+            page_rows = list(page_rows[: items + 1])
+
+        next_cursor = None
+        if len(page_rows) > items:
+            page_rows = page_rows[:items]
+            next_cursor = self.encode_cursor(*page_rows[-1])
+
+        data = []
+        if page_rows:
+            data = ConceptBuilder().serialize_concepts_batch(
+                [str(concept_uuid) for _rank, _edit_distance, concept_uuid in page_rows]
+            )
+
+        response = {
+            "results_per_page": items,
+            "next_cursor": next_cursor,
+            "data": data,
+        }
+        if self.get_bool(request, "count"):
+            cap = getattr(settings, "LINGO_SEARCH_COUNT_CAP", 1000)
+            if isinstance(rows, list):
+                total = len(rows)
+            else:
+                total = rows[: cap + 1].count()
+            response["total_results"] = min(total, cap)
+            response["total_results_capped"] = total > cap
+        return JSONResponse(response)
+
+    @staticmethod
+    def encode_cursor(rank, edit_distance, concept_id):
+        return f"{rank}_{edit_distance}_{concept_id}"
+
+    @staticmethod
+    def decode_cursor(cursor):
+        try:
+            rank, edit_distance, concept_id = cursor.split("_")
+            return int(rank), int(edit_distance), uuid.UUID(concept_id)
+        except ValueError:
+            raise ValueError(_("Invalid cursor."))
+
+    @staticmethod
+    def search_backend():
+        """Where fuzzy matching runs: "database" (LEVENSHTEIN_LESS_EQUAL in
+        Postgres) or "memory" (a SymSpell index of the cached concept
+        labels). The database also serves "memory" searches while the index
+        is built, and those beyond LINGO_SEARCH_MEMORY_MAX_EDIT_DISTANCE."""
+        return getattr(settings, "LINGO_SEARCH_BACKEND", "database")
+
     @staticmethod
     def default_sensitivity():
         """Remains to be seen whether the existing elastic sensitivity setting
@@ -91,3 +364,29 @@ class ValueSearchView(ConceptTreeView):
         if elastic_prefix_length >= 5:
             return 0
         return int(5 - elastic_prefix_length)
+
+
+@method_decorator(
+    group_required("RDM Administrator", raise_exception=True), name="dispatch"
+)
+class AutocompleteView(ConceptTreeView):
+    def get(self, request):
+        """Complete a label prefix from memory, optionally in one language."""
+        term = request.GET.get("term", "")
+        language = request.GET.get("language")
+        try:
+            items = self.get_non_negative_int(request, "items")
+        except ValueError as ve:
+            return JSONErrorResponse(
+                title=_("Unable to perform search."),
+                message=ve.args[0],
+                status=HTTPStatus.BAD_REQUEST,
+            )
+
+        data = []
+        if term:
+            index = PrefixLabelIndex.for_builder(ConceptBuilder())
+            data = index.search(
+                term, language=language, limit=10 if items is None else items
+            )
+        return JSONResponse({"data": data})
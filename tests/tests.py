@@ -1,24 +1,34 @@
 import json
 from http import HTTPStatus
+import sys
+import uuid
+from unittest.mock import patch
 
 from django.contrib.auth.models import User
-from django.test import TestCase
+from django.core.cache import caches
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
 from django.urls import reverse
 
 # these tests can be run from the command line via
 # python manage.py test tests.tests --settings="tests.test_settings"
 
 from arches.app.datatypes.datatypes import DataTypeFactory
+from arches.app.models import models
 from arches.app.models.models import (
+    ETLModule,
     GraphModel,
+    LoadEvent,
     Node,
     NodeGroup,
     ResourceInstance,
     TileModel,
 )
+from arches.app.models.system_settings import settings as system_settings
 
 from arches_lingo.const import (
     CONCEPTS_GRAPH_ID,
+    CONCEPTS_PART_OF_SCHEME_NODEGROUP_ID,
     SCHEMES_GRAPH_ID,
     TOP_CONCEPT_OF_NODE_AND_NODEGROUP,
     CLASSIFICATION_STATUS_NODEGROUP,
@@ -34,6 +44,27 @@ from arches_lingo.const import (
     LANGUAGES_LIST_ID,
     LABEL_LIST_ID,
 )
+from arches_lingo.etl_modules.migrate_to_lingo import (
+    CONCEPT_VALUE_TILES,
+    SCHEME_VALUE_TILES,
+    MigrationCheckpoint,
+    MigrationInProgress,
+    RDMMtoLingoMigrator,
+    details as migrator_details,
+)
+from arches_lingo.tasks import (
+    finish_multi_scheme_lingo_migration_task,
+    stage_scheme_for_lingo_task,
+)
+from arches_lingo.utils.concept_builder import ConceptBuilder
+from arches_lingo.utils.concept_graph import ConceptGraph
+from arches_lingo.utils.label_index import (
+    FuzzyLabelIndex,
+    PrefixLabelIndex,
+    SymSpell,
+    levenshtein,
+)
+from arches_lingo.views.api.concepts import ValueSearchView
 
 
 class ViewTests(TestCase):
@@ -196,14 +227,26 @@ class ViewTests(TestCase):
                     },
                 )
 
+    def setUp(self):
+        caches["lingo"].clear()
+        ValueSearchView.result_cache.clear()
+
+    @staticmethod
+    def memory_search_backend():
+        return patch.object(ValueSearchView, "search_backend", return_value="memory")
+
     def test_get_concept_trees(self):
         self.client.force_login(self.admin)
-        with self.assertNumQueries(5):
+        with self.assertNumQueries(9):
             # 1: session
             # 2: auth
-            # 3: select broader tiles, subquery for labels
-            # 4: select top concept tiles, subquery for labels
-            # 5: select schemes, subquery for labels
+            # 3: take snapshot lock
+            # 4: select top concept tiles
+            # 5: select broader tiles
+            # 6: select labels, grouped by concept
+            # 7: select schemes, subquery for labels
+            # 8: next snapshot version
+            # 9: release snapshot lock
             response = self.client.get(reverse("api-concepts"))
 
         self.assertEqual(response.status_code, 200)
@@ -227,6 +270,253 @@ class ViewTests(TestCase):
             {"Concept 3"},
         )
 
+    def test_get_concept_tree_slices(self):
+        self.client.force_login(self.admin)
+        top_concept_id = str(self.concepts[0].pk)
+
+        response = self.client.get(reverse("api-concepts"), QUERY_STRING="depth=1")
+        scheme = json.loads(response.content)["schemes"][0]
+        top = scheme["top_concepts"][0]
+        self.assertEqual(scheme["top_concept_count"], 1)
+        self.assertEqual(top["narrower_count"], 4)
+        self.assertNotIn("narrower", top)
+
+        response = self.client.get(
+            reverse("api-concepts"),
+            QUERY_STRING=f"parent={top_concept_id}&depth=0&items=3",
+        )
+        first_page = json.loads(response.content)
+        self.assertEqual(len(first_page["narrower"]), 3)
+        self.assertIsNotNone(first_page["next_cursor"])
+
+        response = self.client.get(
+            reverse("api-concepts"),
+            QUERY_STRING=(
+                f"parent={top_concept_id}&depth=0&items=3"
+                f"&cursor={first_page['next_cursor']}"
+            ),
+        )
+        second_page = json.loads(response.content)
+        self.assertEqual(len(second_page["narrower"]), 1)
+        self.assertIsNone(second_page["next_cursor"])
+
+    def test_stream_concept_tree(self):
+        self.client.force_login(self.admin)
+        response = self.client.get(reverse("api-concepts"))
+        streamed_response = self.client.get(
+            reverse("api-concepts"), QUERY_STRING="stream=true"
+        )
+
+        self.assertTrue(streamed_response.streaming)
+        self.assertEqual(
+            json.loads(b"".join(streamed_response.streaming_content))["schemes"],
+            json.loads(response.content)["schemes"],
+        )
+
+    def test_get_concept_tree_not_streamed(self):
+        self.client.force_login(self.admin)
+        for query in ("stream=false", "stream=0"):
+            with self.subTest(query=query):
+                response = self.client.get(reverse("api-concepts"), QUERY_STRING=query)
+                self.assertFalse(response.streaming)
+                self.assertIn("next_cursor", json.loads(response.content))
+
+        with self.assertLogs("django.request", level="WARNING"):
+            response = self.client.get(
+                reverse("api-concepts"), QUERY_STRING="stream=maybe"
+            )
+        self.assertContains(
+            response,
+            "stream must be true or false.",
+            status_code=HTTPStatus.BAD_REQUEST,
+        )
+
+    def test_get_concept_tree_unknown_resource(self):
+        self.client.force_login(self.admin)
+        for query, message in (
+            (f"scheme={self.concepts[0].pk}", "Scheme not found."),
+            (f"parent={uuid.uuid4()}", "Concept not found."),
+        ):
+            with self.subTest(query=query):
+                with self.assertLogs("django.request", level="WARNING"):
+                    response = self.client.get(
+                        reverse("api-concepts"), QUERY_STRING=query
+                    )
+                self.assertContains(response, message, status_code=HTTPStatus.NOT_FOUND)
+
+    def test_get_concept_tree_invalid_depth(self):
+        self.client.force_login(self.admin)
+        with self.assertLogs("django.request", level="WARNING"):
+            response = self.client.get(reverse("api-concepts"), QUERY_STRING="depth=-1")
+        self.assertContains(
+            response,
+            "depth must be a non-negative integer.",
+            status_code=HTTPStatus.BAD_REQUEST,
+        )
+
+    def test_cache_patched_on_tile_save(self):
+        original = ConceptBuilder()
+        top_concept_id = str(self.concepts[0].pk)
+        concept_4_id = str(self.concepts[3].pk)
+        concept_5_id = str(self.concepts[4].pk)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            TileModel.objects.create(
+                resourceinstance=self.concepts[4],
+                nodegroup_id=CLASSIFICATION_STATUS_NODEGROUP,
+                data={
+                    CLASSIFICATION_STATUS_ASCRIBED_CLASSIFICATION_NODEID: [
+                        {"resourceId": concept_4_id},
+                    ],
+                },
+            )
+            label_tile = TileModel.objects.get(
+                resourceinstance=self.concepts[4],
+                nodegroup_id=CONCEPT_NAME_NODEGROUP,
+            )
+            label_tile.data[CONCEPT_NAME_CONTENT_NODE] = "Concept Five"
+            label_tile.save()
+
+        with self.assertNumQueries(0):
+            builder = ConceptBuilder()
+        self.assertGreater(builder.version, original.version)
+        graph = builder.graph
+        self.assertEqual(
+            {graph.ids[node] for node in graph.broader[graph.index[concept_5_id]]},
+            {top_concept_id, concept_4_id},
+        )
+        self.assertIn(
+            graph.index[concept_5_id], graph.narrower[graph.index[concept_4_id]]
+        )
+        self.assertEqual(
+            builder.serialize_concept(concept_5_id)["labels"][0]["value"],
+            "Concept Five",
+        )
+
+    def test_cache_deltas(self):
+        original = ConceptBuilder()
+        label_tiles = [
+            TileModel.objects.get(
+                resourceinstance=concept, nodegroup_id=CONCEPT_NAME_NODEGROUP
+            )
+            for concept in self.concepts[:2]
+        ]
+
+        with patch("arches_lingo.utils.concept_builder.MAX_DELTAS", 2):
+            for label_tile, value in zip(label_tiles, ["First", "Second"]):
+                label_tile.data[CONCEPT_NAME_CONTENT_NODE] = value
+                with self.captureOnCommitCallbacks(execute=True):
+                    label_tile.save()
+                # The snapshot is only rewritten once the deltas add up.
+                self.assertEqual(
+                    caches["lingo"].get("snapshot")["version"] == original.version,
+                    value == "First",
+                )
+
+        # Each edit chains onto the one before rather than replacing it.
+        builder = ConceptBuilder()
+        self.assertEqual(
+            [
+                builder.serialize_concept(str(concept.pk))["labels"][0]["value"]
+                for concept in self.concepts[:2]
+            ],
+            ["First", "Second"],
+        )
+        self.assertEqual(caches["lingo"].get("snapshot")["version"], builder.version)
+        # A process holding the original version catches up from the deltas.
+        self.assertEqual(
+            ConceptBuilder.apply_deltas(
+                original.snapshot(),
+                ConceptBuilder.deltas_between(original.version, builder.version),
+            )["labels"],
+            builder.labels,
+        )
+        # The original snapshot was left intact.
+        self.assertEqual(
+            original.serialize_concept(str(self.concepts[0].pk))["labels"][0]["value"],
+            "Concept 1",
+        )
+
+    def test_cache_busy_on_tile_save(self):
+        original = ConceptBuilder()
+        label_tile = TileModel.objects.get(
+            resourceinstance=self.concepts[0], nodegroup_id=CONCEPT_NAME_NODEGROUP
+        )
+        label_tile.data[CONCEPT_NAME_CONTENT_NODE] = "Concept One"
+
+        # Another session (a rebuild, say) holds the snapshot lock.
+        other_session = connection.get_new_connection(
+            connection.get_connection_params()
+        )
+        try:
+            with other_session.cursor() as cursor:
+                cursor.execute(
+                    "SELECT pg_advisory_lock(hashtext(%s))",
+                    ["arches_lingo_concept_snapshot"],
+                )
+            with (
+                patch("arches_lingo.utils.concept_builder.LOCK_WAIT", 0),
+                self.captureOnCommitCallbacks(execute=True),
+            ):
+                label_tile.save()
+            self.assertIsNone(ConceptBuilder.published_version())
+        finally:
+            other_session.close()
+
+        # Left to the next rebuild rather than waiting for the lock.
+        builder = ConceptBuilder()
+        self.assertGreater(builder.version, original.version)
+        self.assertEqual(
+            builder.serialize_concept(str(self.concepts[0].pk))["labels"][0]["value"],
+            "Concept One",
+        )
+
+    def test_cache_failure_on_tile_save(self):
+        label_tile = TileModel.objects.get(
+            resourceinstance=self.concepts[0], nodegroup_id=CONCEPT_NAME_NODEGROUP
+        )
+        label_tile.data[CONCEPT_NAME_CONTENT_NODE] = "Concept One"
+        with (
+            patch.object(
+                ConceptBuilder, "update_cache_for_tile", side_effect=OSError
+            ) as update_cache_for_tile,
+            self.assertLogs("arches_lingo.signals", "ERROR"),
+            self.captureOnCommitCallbacks(execute=True),
+        ):
+            label_tile.save()
+        update_cache_for_tile.assert_called_once()
+
+    def test_unnamed_concept(self):
+        label_tile = TileModel.objects.get(
+            resourceinstance=self.concepts[4], nodegroup_id=CONCEPT_NAME_NODEGROUP
+        )
+        label_tile.data[CONCEPT_NAME_CONTENT_NODE] = None
+        with self.captureOnCommitCallbacks(execute=True):
+            label_tile.save()
+
+        builder = ConceptBuilder()
+        concept_5_id = str(self.concepts[4].pk)
+        # Cached without a value, shown with a placeholder.
+        self.assertIsNone(builder.labels[concept_5_id][0]["value"])
+        self.assertEqual(
+            builder.serialize_concept(concept_5_id)["labels"][0]["value"], "Unknown"
+        )
+
+    def test_serialize_concepts_batch(self):
+        concept_ids = [str(concept.pk) for concept in self.concepts]
+        batch = ConceptBuilder().serialize_concepts_batch(concept_ids)
+
+        builder = ConceptBuilder()
+        self.assertEqual(
+            batch,
+            [
+                builder.serialize_concept(concept_id, parents=True, children=False)
+                for concept_id in concept_ids
+            ],
+        )
+        # The scheme is serialized once and shared across the batch.
+        self.assertIs(batch[0]["parents"][0], batch[4]["parents"][0])
+
     def test_search(self):
         self.client.force_login(self.admin)
 
@@ -249,6 +539,188 @@ class ViewTests(TestCase):
                 result = json.loads(response.content)
                 self.assertEqual(len(result["data"]), expected_result_count, result)
 
+    def test_search_memory_backend(self):
+        self.client.force_login(self.admin)
+        label_tile = TileModel.objects.get(
+            resourceinstance=self.concepts[4], nodegroup_id=CONCEPT_NAME_NODEGROUP
+        )
+        label_tile.data[CONCEPT_NAME_CONTENT_NODE] = None
+        with self.captureOnCommitCallbacks(execute=True):
+            label_tile.save()
+        # Built in the background when first needed: build it up front.
+        FuzzyLabelIndex.build(ConceptBuilder())
+
+        queries = (
+            "term=Unknown",
+            "term=Concept 1",
+            "term=Concept 1&maxEditDistance=0",
+            "term=concept 3&maxEditDistance=2",
+            "term=Con&items=3&cursor=",
+            "term=Conc&items=4&page=2",
+        )
+        for query in queries:
+            with self.subTest(query=query):
+                response = self.client.get(reverse("api-search"), QUERY_STRING=query)
+                with self.memory_search_backend():
+                    memory_response = self.client.get(
+                        reverse("api-search"), QUERY_STRING=query
+                    )
+                self.assertEqual(
+                    json.loads(memory_response.content), json.loads(response.content)
+                )
+
+        # Not limited to the database's 255 characters.
+        with self.memory_search_backend():
+            response = self.client.get(
+                reverse("api-search"), QUERY_STRING="term=" + ("!" * 256)
+            )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_fuzzy_index_built_in_background(self):
+        builder = ConceptBuilder()
+        with patch.object(FuzzyLabelIndex, "build_in_background") as build:
+            with patch("arches_lingo.utils.label_index._fuzzy_index", None):
+                self.assertIsNone(FuzzyLabelIndex.for_builder(builder))
+        build.assert_called_once_with(builder)
+
+        index = FuzzyLabelIndex.build(builder)
+        self.assertIs(FuzzyLabelIndex.for_builder(builder), index)
+        self.assertEqual(
+            index.search("concept 2", 0), [(0, 0, str(self.concepts[1].pk))]
+        )
+
+    def test_search_result_cache(self):
+        self.client.force_login(self.admin)
+        response = self.client.get(reverse("api-search"), QUERY_STRING="term=Con")
+        self.assertTrue(response["X-Lingo-Search-Cache"].startswith("miss"))
+
+        with self.assertNumQueries(2):
+            # 1: session
+            # 2: auth
+            cached_response = self.client.get(
+                reverse("api-search"), QUERY_STRING="term=Con"
+            )
+        self.assertEqual(
+            cached_response["X-Lingo-Search-Cache"], "hit; hits=1; misses=1"
+        )
+        self.assertEqual(cached_response.content, response.content)
+
+        # Cached per language, so translated placeholders aren't shared.
+        with self.settings(LANGUAGES=[("en", "English"), ("de", "German")]):
+            response = self.client.get(
+                reverse("api-search"),
+                QUERY_STRING="term=Con",
+                HTTP_ACCEPT_LANGUAGE="de",
+            )
+        self.assertTrue(response["X-Lingo-Search-Cache"].startswith("miss"))
+
+        # Editing a label publishes a new snapshot version.
+        label_tile = TileModel.objects.filter(
+            resourceinstance=self.concepts[0], nodegroup_id=CONCEPT_NAME_NODEGROUP
+        ).get()
+        label_tile.data[CONCEPT_NAME_CONTENT_NODE] = "Concept One"
+        with self.captureOnCommitCallbacks(execute=True):
+            label_tile.save()
+        response = self.client.get(reverse("api-search"), QUERY_STRING="term=Con")
+        self.assertTrue(response["X-Lingo-Search-Cache"].startswith("miss"))
+        self.assertIn(b"Concept One", response.content)
+
+    def test_search_ranking(self):
+        self.client.force_login(self.admin)
+        response = self.client.get(
+            reverse("api-search"), QUERY_STRING="term=concept 3&maxEditDistance=2"
+        )
+        result = json.loads(response.content)
+        # Exact (case-insensitive) match first, then fuzzy matches, each once.
+        self.assertEqual(result["data"][0]["labels"][0]["value"], "Concept 3")
+        self.assertEqual(len({concept["id"] for concept in result["data"]}), 5)
+
+    def test_search_keyset_pagination(self):
+        self.client.force_login(self.admin)
+        response = self.client.get(
+            reverse("api-search"), QUERY_STRING="term=Con&items=3&cursor=&count=true"
+        )
+        first_page = json.loads(response.content)
+        self.assertEqual(len(first_page["data"]), 3)
+        self.assertEqual(first_page["total_results"], 5)
+        self.assertFalse(first_page["total_results_capped"])
+
+        response = self.client.get(
+            reverse("api-search"),
+            QUERY_STRING=f"term=Con&items=3&cursor={first_page['next_cursor']}",
+        )
+        second_page = json.loads(response.content)
+        self.assertEqual(len(second_page["data"]), 2)
+        self.assertIsNone(second_page["next_cursor"])
+        self.assertNotIn("total_results", second_page)
+
+        for count in ("false", "0"):
+            with self.subTest(count=count):
+                response = self.client.get(
+                    reverse("api-search"),
+                    QUERY_STRING=f"term=Con&items=3&cursor=&count={count}",
+                )
+                self.assertNotIn("total_results", json.loads(response.content))
+
+        response = self.client.get(
+            reverse("api-search"), QUERY_STRING="term=Con&cursor=&count=maybe"
+        )
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+
+    def test_autocomplete(self):
+        self.client.force_login(self.admin)
+        # Warm the concept cache.
+        self.client.get(reverse("api-autocomplete"), QUERY_STRING="term=c")
+
+        with self.assertNumQueries(2):
+            # 1: session
+            # 2: auth
+            response = self.client.get(
+                reverse("api-autocomplete"), QUERY_STRING="term=concept&items=2"
+            )
+        result = json.loads(response.content)
+        self.assertEqual(
+            [label["value"] for label in result["data"]], ["Concept 1", "Concept 2"]
+        )
+
+        response = self.client.get(
+            reverse("api-autocomplete"), QUERY_STRING="term=concept 3&language=en"
+        )
+        self.assertEqual(
+            json.loads(response.content)["data"],
+            [
+                {
+                    "id": str(self.concepts[2].pk),
+                    "value": "Concept 3",
+                    "language_id": "en",
+                }
+            ],
+        )
+        response = self.client.get(
+            reverse("api-autocomplete"), QUERY_STRING="term=concept&language=fr"
+        )
+        self.assertEqual(json.loads(response.content)["data"], [])
+
+    def test_autocomplete_index_patched(self):
+        index = PrefixLabelIndex.for_builder(ConceptBuilder())
+        for concept, value in ((self.concepts[1], "Zebra"), (self.concepts[4], None)):
+            label_tile = TileModel.objects.get(
+                resourceinstance=concept, nodegroup_id=CONCEPT_NAME_NODEGROUP
+            )
+            label_tile.data[CONCEPT_NAME_CONTENT_NODE] = value
+            with self.captureOnCommitCallbacks(execute=True):
+                label_tile.save()
+
+        # Patched in place rather than rebuilt.
+        self.assertIs(PrefixLabelIndex.for_builder(ConceptBuilder()), index)
+        self.assertEqual(
+            [label["value"] for label in index.search("concept")],
+            ["Concept 1", "Concept 3", "Concept 4"],
+        )
+        self.assertEqual([label["value"] for label in index.search("z")], ["Zebra"])
+        # Concepts without a name aren't completed as "Unknown".
+        self.assertEqual(index.search("unk"), [])
+
     def test_invalid_search_term(self):
         self.client.force_login(self.admin)
         with self.assertLogs("django.request", level="WARNING"):
@@ -272,3 +744,687 @@ class ViewTests(TestCase):
             "Edit distance could not be converted to an integer.",
             status_code=HTTPStatus.BAD_REQUEST,
         )
+
+
+class RDMMigrationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        ViewTests.mock_concept_and_scheme_graphs()
+        cls.admin = User.objects.get(username="admin")
+        ETLModule.objects.create(**migrator_details)
+
+    def setUp(self):
+        self.loadid = str(uuid.uuid4())
+        LoadEvent.objects.create(
+            loadid=self.loadid,
+            user=self.admin,
+            etl_module_id=migrator_details["etlmoduleid"],
+            status="running",
+            load_details={"operation": "RDM to Lingo Migration"},
+        )
+        self.migrator = RDMMtoLingoMigrator(loadid=self.loadid)
+
+    def test_copy_text(self):
+        cases = (
+            (None, "\\N"),
+            (True, "t"),
+            (False, "f"),
+            (3, "3"),
+            ("tab\there", "tab\\there"),
+            ("line\nbreak\r\n", "line\\nbreak\\r\\n"),
+            ("back\\slash", "back\\\\slash"),
+            ("Ελληνικά – 日本語", "Ελληνικά – 日本語"),
+            # JSON escapes its own control characters; COPY escapes the
+            # backslashes that produces.
+            ({"value": "a\tb"}, '{"value": "a\\\\tb"}'),
+        )
+        for value, expected in cases:
+            with self.subTest(value=value):
+                self.assertEqual(RDMMtoLingoMigrator.copy_text(value), expected)
+
+    def test_copy_to_staging(self):
+        tileid = uuid.uuid4()
+        value = {
+            CONCEPT_NAME_CONTENT_NODE: {
+                "value": "tab\t, line\nbreak\r\n, back\\slash, Ελληνικά – 日本語",
+                "valid": True,
+            }
+        }
+        source_description = "Concept:\tappellative_status\n\\N"
+        with connection.cursor() as cursor:
+            self.migrator.copy_to_staging(
+                cursor,
+                [
+                    (
+                        self.loadid,
+                        CONCEPT_NAME_NODEGROUP,
+                        uuid.uuid4(),
+                        tileid,
+                        None,
+                        value,
+                        0,
+                        source_description,
+                        False,
+                        "insert",
+                    )
+                ],
+            )
+            cursor.execute(
+                """SELECT value::text, source_description, parenttileid, passes_validation
+                FROM load_staging WHERE tileid = %s""",
+                [tileid],
+            )
+            staged_value, staged_source, parenttileid, passes_validation = (
+                cursor.fetchone()
+            )
+
+        self.assertEqual(json.loads(staged_value), value)
+        self.assertEqual(staged_source, source_description)
+        self.assertIsNone(parenttileid)
+        self.assertFalse(passes_validation)
+
+    def test_flush_node_errors(self):
+        node_errors = [
+            (
+                "node",
+                f"value {i}\twith a tab",
+                "",
+                "Invalid value",
+                "Ελληνικά",
+                "non-localized-string",
+                self.loadid,
+                CONCEPT_NAME_CONTENT_NODE,
+            )
+            for i in range(3)
+        ]
+        with connection.cursor() as cursor:
+            with self.assertNumQueries(1):
+                self.migrator.flush_node_errors(cursor, node_errors)
+            cursor.execute(
+                """SELECT value, message FROM load_errors WHERE loadid = %s ORDER BY value""",
+                [self.loadid],
+            )
+            rows = cursor.fetchall()
+
+        self.assertEqual(node_errors, [])
+        self.assertEqual(
+            rows, [(f"value {i}\twith a tab", "Ελληνικά") for i in range(3)]
+        )
+
+    def test_checkpoint_rolls_back_failed_step(self):
+        scheme_conceptid = str(uuid.uuid4())
+        with connection.cursor() as cursor:
+            checkpoint = MigrationCheckpoint(cursor, self.loadid, scheme_conceptid)
+
+            def failing_step():
+                cursor.execute(
+                    """UPDATE load_event SET status = 'staged' WHERE loadid = %s""",
+                    [self.loadid],
+                )
+                return {"success": False}
+
+            self.assertEqual(checkpoint.run("scheme", failing_step), {"success": False})
+            self.assertEqual(LoadEvent.objects.get(pk=self.loadid).status, "running")
+            self.assertFalse(checkpoint.is_done("scheme"))
+
+            self.assertIsNone(checkpoint.run("scheme", lambda: None))
+            # Recorded in the load event, so a rerun skips the step.
+            rerun = MigrationCheckpoint(cursor, self.loadid, scheme_conceptid)
+            self.assertTrue(rerun.is_done("scheme"))
+            steps_run = []
+            rerun.run("scheme", steps_run.append, "scheme")
+            self.assertEqual(steps_run, [])
+
+    def test_resume_concept_chunks(self):
+        scheme_conceptid = str(uuid.uuid4())
+        conceptids = sorted(uuid.uuid4() for _ in range(5))
+        staged = []
+        interrupt = [True]
+
+        def stage_chunk(cursor, nodegroup_lookup, node_lookup, chunk):
+            if interrupt[0] and staged:
+                raise RuntimeError("Interrupted")
+            staged.append(chunk)
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                """
+                create temporary table lingo_concept_hierarchy (
+                    concept uuid primary key,
+                    depth integer not null
+                );
+                """
+            )
+            for conceptid in conceptids:
+                cursor.execute(
+                    """insert into lingo_concept_hierarchy values (%s, 0);""",
+                    [conceptid],
+                )
+
+            self.migrator.batch_size = 2
+            with patch.object(
+                self.migrator, "etl_concepts_chunk", side_effect=stage_chunk
+            ):
+                with self.assertRaises(RuntimeError):
+                    self.migrator.etl_concepts(
+                        cursor,
+                        {},
+                        {},
+                        len(conceptids),
+                        MigrationCheckpoint(cursor, self.loadid, scheme_conceptid),
+                    )
+
+                # Resumed with another batch size: every concept after the
+                # last one staged, and only those.
+                interrupt[0] = False
+                self.migrator.batch_size = 3
+                checkpoint = MigrationCheckpoint(cursor, self.loadid, scheme_conceptid)
+                self.migrator.etl_concepts(cursor, {}, {}, len(conceptids), checkpoint)
+
+        self.assertEqual(staged, [conceptids[:2], conceptids[2:]])
+        self.assertEqual(checkpoint.positions, {"concepts": str(conceptids[-1])})
+        self.assertEqual(checkpoint.chunks, 2)
+
+    def test_resume_load_without_schemes(self):
+        response = self.migrator.resume_load(self.admin.id, self.loadid)
+
+        self.assertFalse(response["success"])
+        self.assertEqual(response["status"], 400)
+        self.assertEqual(LoadEvent.objects.get(pk=self.loadid).status, "running")
+
+    def test_save_load_rebuilds_concept_cache(self):
+        # Tiles saved in SQL fire no signals, so the load publishes the
+        # concept cache anew once they are saved.
+        module = "arches_lingo.etl_modules.migrate_to_lingo"
+        with (
+            patch.object(self.migrator, "check_staged_tiles"),
+            patch.object(self.migrator, "validate", return_value={"data": []}),
+            patch(f"{module}.save_to_tiles", return_value={"success": True}),
+            patch.object(ConceptBuilder, "rebuild_cache") as rebuild_cache,
+            connection.cursor() as cursor,
+        ):
+            self.migrator.save_load(cursor, self.admin.id, self.loadid)
+            rebuild_cache.assert_called_once()
+
+            rebuild_cache.reset_mock()
+            with patch(f"{module}.save_to_tiles", return_value={"success": False}):
+                self.migrator.save_load(cursor, self.admin.id, self.loadid)
+            rebuild_cache.assert_not_called()
+
+    def test_concurrent_runs_locked_out(self):
+        scheme_conceptid = str(uuid.uuid4())
+        other_session = connection.get_new_connection(
+            connection.get_connection_params()
+        )
+        try:
+            # Another run (a redelivered task, say) is staging the scheme.
+            with other_session.cursor() as other_cursor:
+                other_cursor.execute(
+                    "SELECT pg_advisory_lock(hashtext(%s))",
+                    [self.loadid + scheme_conceptid],
+                )
+            with connection.cursor() as cursor:
+                with (
+                    patch.object(self.migrator, "stage_scheme_steps") as steps,
+                    self.assertRaises(MigrationInProgress),
+                ):
+                    self.migrator.stage_scheme(cursor, scheme_conceptid)
+                steps.assert_not_called()
+
+            # ... or saving the load.
+            with other_session.cursor() as other_cursor:
+                other_cursor.execute(
+                    "SELECT pg_advisory_lock(hashtext(%s))", [self.loadid]
+                )
+            with connection.cursor() as cursor:
+                with (
+                    patch.object(self.migrator, "save_staged_tiles") as save,
+                    self.assertRaises(MigrationInProgress),
+                ):
+                    self.migrator.save_load(cursor, self.admin.id, self.loadid)
+                save.assert_not_called()
+        finally:
+            other_session.close()
+        self.assertEqual(LoadEvent.objects.get(pk=self.loadid).status, "running")
+
+    def test_save_load_requires_staged_schemes(self):
+        staged, unstaged = str(uuid.uuid4()), str(uuid.uuid4())
+        load_event = LoadEvent.objects.get(pk=self.loadid)
+        load_event.load_details["schemes"] = [staged, unstaged]
+        load_event.save()
+        with connection.cursor() as cursor:
+            MigrationCheckpoint(cursor, self.loadid, staged).run(
+                "part_of_scheme", lambda: None
+            )
+            with patch.object(self.migrator, "save_staged_tiles") as save:
+                response = self.migrator.save_load(cursor, self.admin.id, self.loadid)
+            save.assert_not_called()
+
+        self.assertFalse(response["success"])
+        self.assertIn(unstaged, response["message"])
+        self.assertEqual(LoadEvent.objects.get(pk=self.loadid).status, "failed")
+
+    def create_schemes(self, *top_concepts_per_scheme):
+        """Create RDM schemes with the given top concepts, without values,
+        and record them as this load's schemes."""
+        schemes = []
+        for top_concepts in top_concepts_per_scheme:
+            scheme = models.Concept.objects.create(nodetype_id="ConceptScheme")
+            for concept in top_concepts:
+                models.Relation.objects.create(
+                    conceptfrom=scheme,
+                    conceptto=concept,
+                    relationtype_id="hasTopConcept",
+                )
+            schemes.append(str(scheme.pk))
+        load_event = LoadEvent.objects.get(pk=self.loadid)
+        load_event.load_details["schemes"] = schemes
+        load_event.save()
+        return schemes
+
+    def staged_schemes(self):
+        """Map each concept staged as part of a scheme to that scheme."""
+        with connection.cursor() as cursor:
+            cursor.execute(
+                """
+                SELECT resourceid, value -> %s ->> 'source' FROM load_staging
+                WHERE loadid = %s AND nodegroupid = %s
+                """,
+                [
+                    str(CONCEPTS_PART_OF_SCHEME_NODEGROUP_ID),
+                    self.loadid,
+                    CONCEPTS_PART_OF_SCHEME_NODEGROUP_ID,
+                ],
+            )
+            return {str(resourceid): scheme for resourceid, scheme in cursor.fetchall()}
+
+    def test_multi_scheme_load(self):
+        first, second, third = [
+            models.Concept.objects.create(nodetype_id="Concept") for _ in range(3)
+        ]
+        first_scheme, second_scheme = self.create_schemes([first, second], [third])
+
+        # As the chord runs them: staging each scheme, then saving the load.
+        with (
+            patch.object(RDMMtoLingoMigrator, "get_graph_tree", return_value=({}, [])),
+            patch.object(RDMMtoLingoMigrator, "get_node_lookup", return_value={}),
+        ):
+            results = [
+                stage_scheme_for_lingo_task(self.loadid, scheme)
+                for scheme in (first_scheme, second_scheme)
+            ]
+        self.assertEqual(results, [None, None])
+        self.assertEqual(
+            self.staged_schemes(),
+            {
+                str(first.pk): first_scheme,
+                str(second.pk): first_scheme,
+                str(third.pk): second_scheme,
+            },
+        )
+
+        with (
+            patch.object(
+                RDMMtoLingoMigrator,
+                "save_staged_tiles",
+                return_value={"success": True},
+            ) as save,
+            patch("arches_lingo.tasks.notify_completion"),
+        ):
+            finish_multi_scheme_lingo_migration_task(
+                results, self.admin.id, self.loadid
+            )
+        save.assert_called_once()
+        self.assertEqual(LoadEvent.objects.get(pk=self.loadid).status, "running")
+
+    def test_multi_scheme_load_shared_concept(self):
+        shared, other = [
+            models.Concept.objects.create(nodetype_id="Concept") for _ in range(2)
+        ]
+        schemes = self.create_schemes([shared], [shared, other])
+
+        def stage_scheme(scheme_conceptid):
+            # Django connections are per thread: stage on the test's own.
+            with connection.cursor() as cursor:
+                return self.migrator.stage_scheme(cursor, scheme_conceptid)
+
+        class InlineExecutor:
+            def __init__(self, max_workers):
+                pass
+
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *exc_info):
+                pass
+
+            map = staticmethod(map)
+
+        module = "arches_lingo.etl_modules.migrate_to_lingo"
+        with (
+            patch(f"{module}.ThreadPoolExecutor", InlineExecutor),
+            patch.object(
+                self.migrator,
+                "stage_scheme_on_own_connection",
+                side_effect=stage_scheme,
+            ),
+            patch.object(RDMMtoLingoMigrator, "get_graph_tree", return_value=({}, [])),
+            patch.object(RDMMtoLingoMigrator, "get_node_lookup", return_value={}),
+            patch.object(RDMMtoLingoMigrator, "save_staged_tiles") as save,
+        ):
+            response = self.migrator.run_multi_scheme_load_task(
+                self.admin.id, self.loadid, schemes
+            )
+
+        self.assertFalse(response["success"])
+        self.assertIn("multiple schemes", response["message"])
+        self.assertIn(str(shared.pk), response["message"])
+        save.assert_not_called()
+        self.assertEqual(LoadEvent.objects.get(pk=self.loadid).status, "failed")
+        # The conflicting scheme's part-of-scheme tiles were rolled back.
+        self.assertEqual(self.staged_schemes(), {str(shared.pk): schemes[0]})
+
+    def test_fits_time_budget(self):
+        scheme = models.Concept.objects.create(nodetype_id="ConceptScheme")
+        top, narrower, member = [
+            models.Concept.objects.create(nodetype_id="Concept") for _ in range(3)
+        ]
+        for conceptfrom, conceptto, relationtype in (
+            (scheme, top, "hasTopConcept"),
+            (top, narrower, "narrower"),
+            # A cycle, which the estimate must still end.
+            (narrower, top, "narrower"),
+            (narrower, scheme, "narrower"),
+            (top, member, "member"),
+        ):
+            models.Relation.objects.create(
+                conceptfrom=conceptfrom,
+                conceptto=conceptto,
+                relationtype_id=relationtype,
+            )
+
+        # The scheme, its two concepts and no values: 3 * 0.002 seconds.
+        for budget, fits in ((1, True), (0.01, True), (0.004, False), (0.001, False)):
+            with (
+                self.subTest(budget=budget),
+                patch.object(
+                    system_settings,
+                    "LINGO_MIGRATION_SYNC_TIME_BUDGET",
+                    budget,
+                    create=True,
+                ),
+            ):
+                self.assertIs(self.migrator.fits_time_budget([str(scheme.pk)]), fits)
+
+    def test_stage_part_of_scheme(self):
+        first_scheme, second_scheme = str(uuid.uuid4()), str(uuid.uuid4())
+        shared, other = sorted(uuid.uuid4() for _ in range(2))
+        nodegroupid = str(CONCEPTS_PART_OF_SCHEME_NODEGROUP_ID)
+
+        def staged_rows():
+            cursor.execute(
+                """
+                SELECT resourceid, value::text, nodegroupid, operation, passes_validation
+                FROM load_staging WHERE loadid = %s ORDER BY resourceid, value::text
+                """,
+                [self.loadid],
+            )
+            return [
+                (resourceid, json.loads(value), str(nodegroup), operation, passes)
+                for resourceid, value, nodegroup, operation, passes in cursor.fetchall()
+            ]
+
+        def part_of_scheme(scheme_conceptid):
+            return {
+                nodegroupid: {
+                    "notes": "",
+                    "valid": True,
+                    "value": [
+                        {
+                            "resourceId": scheme_conceptid,
+                            "ontologyProperty": "",
+                            "resourceXresourceId": "",
+                            "inverseOntologyProperty": "",
+                        }
+                    ],
+                    "source": scheme_conceptid,
+                    "datatype": "resource-instance",
+                }
+            }
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                """
+                create temporary table lingo_concept_hierarchy (
+                    concept uuid primary key,
+                    depth integer not null
+                );
+                """
+            )
+            cursor.execute(
+                """insert into lingo_concept_hierarchy values (%s, 0);""", [shared]
+            )
+            self.assertIsNone(self.migrator.stage_part_of_scheme(cursor, first_scheme))
+            first_rows = staged_rows()
+            self.assertEqual(
+                first_rows,
+                [(shared, part_of_scheme(first_scheme), nodegroupid, "insert", True)],
+            )
+
+            # The second scheme shares a concept: its rows are rolled back.
+            cursor.execute(
+                """insert into lingo_concept_hierarchy values (%s, 0);""", [other]
+            )
+            checkpoint = MigrationCheckpoint(cursor, self.loadid, second_scheme)
+            error = checkpoint.run(
+                "part_of_scheme",
+                self.migrator.stage_part_of_scheme,
+                cursor,
+                second_scheme,
+            )
+            self.assertIn(str(shared), error["message"])
+            self.assertFalse(checkpoint.is_done("part_of_scheme"))
+            self.assertEqual(staged_rows(), first_rows)
+
+    def test_build_concept_hierarchy(self):
+        scheme = models.Concept.objects.create(nodetype_id="ConceptScheme")
+        top, left, right, bottom, member = [
+            models.Concept.objects.create(nodetype_id="Concept") for _ in range(5)
+        ]
+        for conceptfrom, conceptto, relationtype in (
+            (scheme, top, "hasTopConcept"),
+            # Polyhierarchy: bottom is narrower than both left and right.
+            (top, left, "narrower"),
+            (top, right, "narrower"),
+            (left, bottom, "narrower"),
+            (right, bottom, "narrower"),
+            # Cycles back to the top concept and to the scheme.
+            (bottom, top, "narrower"),
+            (bottom, scheme, "narrower"),
+            # Collections aren't part of the hierarchy.
+            (top, member, "member"),
+        ):
+            models.Relation.objects.create(
+                conceptfrom=conceptfrom,
+                conceptto=conceptto,
+                relationtype_id=relationtype,
+            )
+
+        with connection.cursor() as cursor:
+            concept_count = self.migrator.build_concept_hierarchy(cursor, scheme.pk)
+            cursor.execute("""select concept, depth from lingo_concept_hierarchy;""")
+            depths = dict(cursor.fetchall())
+
+        # Each concept once, at the depth it is first reached.
+        self.assertEqual(concept_count, 4)
+        self.assertEqual(depths, {top.pk: 0, left.pk: 1, right.pk: 1, bottom.pk: 2})
+
+    def test_transform_values(self):
+        first, second = sorted(str(uuid.uuid4()) for _ in range(2))
+        rows = [
+            (first, "prefLabel", "Label", "en"),
+            (first, "identifier", "ID-1", "en"),
+            (first, "scopeNote", "Note", "fr"),
+            (first, "sortorder", "1", "en"),
+            (second, "altLabel", "Other label", "de"),
+            (second, "image", "image.png", "en"),
+        ]
+        label_tile = {
+            "appellative_status": {
+                "appellative_status_ascribed_name_content": "Label",
+                "appellative_status_ascribed_name_language": "en",
+                "appellative_status_ascribed_relation": "prefLabel",
+            }
+        }
+        identifier_tile = {
+            "identifier": {
+                "identifier_content": "ID-1",
+                "identifier_type": "identifier",
+            }
+        }
+
+        schemes = RDMMtoLingoMigrator.transform_values(
+            rows[:4], "Scheme", SCHEME_VALUE_TILES
+        )
+        self.assertEqual(
+            schemes,
+            [
+                {
+                    "type": "Scheme",
+                    "resourceinstanceid": first,
+                    "tile_data": [
+                        label_tile,
+                        identifier_tile,
+                        {
+                            "statement": {
+                                "statement_content_n1": "Note",
+                                "statement_type_n1": "scopeNote",
+                                "statement_language_n1": "fr",
+                            }
+                        },
+                    ],
+                }
+            ],
+        )
+
+        concepts = RDMMtoLingoMigrator.transform_values(
+            rows, "Concept", CONCEPT_VALUE_TILES
+        )
+        self.assertEqual(
+            concepts,
+            [
+                {
+                    "type": "Concept",
+                    "resourceinstanceid": first,
+                    "tile_data": [
+                        label_tile,
+                        identifier_tile,
+                        {
+                            "statement": {
+                                "statement_content": "Note",
+                                "statement_type": "scopeNote",
+                                "statement_language": "fr",
+                            }
+                        },
+                    ],
+                },
+                {
+                    "type": "Concept",
+                    "resourceinstanceid": second,
+                    "tile_data": [
+                        {
+                            "appellative_status": {
+                                "appellative_status_ascribed_name_content": "Other label",
+                                "appellative_status_ascribed_name_language": "de",
+                                "appellative_status_ascribed_relation": "altLabel",
+                            }
+                        }
+                    ],
+                },
+            ],
+        )
+
+
+class LabelIndexTests(SimpleTestCase):
+    def test_symspell(self):
+        values = [
+            "Concept",
+            "Concepts",
+            "Concept 1",
+            "Concept 12",
+            "oncept 1",
+            "Xoncept 1",
+            "Cnocept 1",
+            "Ελληνικά",
+            "ab",
+            "a",
+        ]
+        terms = ["Concept 1", "Concept", "Koncept 12", "Ελλhνικά", "b", "", "xyz"]
+        symspell = SymSpell(values, max_distance=2)
+        symspell.remove("Concepts")
+        symspell.add("Concepts 1")
+        values = [value for value in values if value != "Concepts"] + ["Concepts 1"]
+
+        # The same matches as comparing the term with every value.
+        for term in terms:
+            for max_distance in range(3):
+                with self.subTest(term=term, max_distance=max_distance):
+                    self.assertEqual(
+                        sorted(symspell.search(term, max_distance)),
+                        sorted(
+                            (value, distance)
+                            for value in values
+                            if (distance := levenshtein(term, value)) <= max_distance
+                        ),
+                    )
+
+    def test_fuzzy_index_edit_distance_cap(self):
+        index = FuzzyLabelIndex(
+            {"1": [{"value": "Concept 1", "language_id": "en"}]}, version=1
+        )
+        self.assertTrue(index.covers("2"))
+        self.assertFalse(index.covers(3))
+        self.assertFalse(index.covers(-1))
+        # Larger distances are left to the database.
+        with self.assertRaises(ValueError):
+            index.search("Concept", 3)
+        self.assertEqual(index.search("Konzept 1", 2), [(3, 2, "1")])
+
+
+class ConceptGraphTests(SimpleTestCase):
+    def path(self, graph, conceptid):
+        return [
+            graph.ids[node] if node is not None else None
+            for node in graph.broader_path(graph.index[conceptid])
+        ]
+
+    def test_broader_path_cycle(self):
+        graph = ConceptGraph.from_edges(
+            [],
+            [("b", "a"), ("a", "b"), ("a", "c")],
+        )
+        # The cycle is cut rather than followed forever, and reaches no scheme.
+        self.assertEqual(self.path(graph, "c"), [None, "b", "a"])
+        self.assertEqual(self.path(graph, "a"), [None, "b"])
+        self.assertEqual(self.path(graph, "b"), [None])
+
+    def test_broader_path_deeper_than_recursion_limit(self):
+        depth = sys.getrecursionlimit() + 100
+        concepts = [f"concept-{i:06}" for i in range(depth)]
+        graph = ConceptGraph.from_edges(
+            [("scheme", concepts[0])],
+            zip(concepts, concepts[1:]),
+        )
+        self.assertEqual(self.path(graph, concepts[-1]), ["scheme", *concepts[:-1]])
+        # Memoized: a concept sharing that ancestry reads it back.
+        self.assertEqual(self.path(graph, concepts[-2]), ["scheme", *concepts[:-2]])
+
+    def test_broader_path_without_scheme(self):
+        graph = ConceptGraph.from_edges(
+            [("scheme", "top")],
+            [("top", "narrower"), ("orphan", "child")],
+        )
+        self.assertEqual(self.path(graph, "narrower"), ["scheme", "top"])
+        # The top of this hierarchy isn't a top concept of any scheme.
+        self.assertEqual(self.path(graph, "child"), [None, "orphan"])
+        self.assertEqual(self.path(graph, "orphan"), [None])